@@ -42,7 +42,6 @@ import sndhdr
 import warnings
 
 import numpy as np
-import pyaudio
 
 
 class AudioManager(object):
@@ -162,6 +161,9 @@ class AudioManager(object):
         if self.wf is None:
             raise StandardError("AuudioManager cant play. wave object is None")
 
+        # 再生にのみ使うので, 読み込みだけならpyaudioは不要
+        import pyaudio
+
         # print '\n== Audio:play run.. =='
         # print('>>Audio Channel :: %s' % play_channel)
         # print('>>Audio volume :: %s' % boost_db)
@@ -0,0 +1,37 @@
+#! coding:utf-8
+"""
+test_*.pyで共有するテストデータ(tests/audio.wav)
+"""
+import os
+import unittest
+
+#: テスト用の録音(ステレオ, 16bit)
+AUDIO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "audio.wav")
+
+
+def load_audio():
+    """tests/audio.wavの左チャンネル全体(-1〜1), fs"""
+    from scipy.io import wavfile
+
+    fs, data = wavfile.read(AUDIO_PATH)
+    return data[:, 0] / 32768., fs
+
+
+def load_impact():
+    """tests/audio.wavの80-120[ms](golfanalysis1.pyと同じ区間), fs"""
+    x, fs = load_audio()
+    return x[int(0.080 * fs):int(0.120 * fs)], fs
+
+
+class AudioTestCase(unittest.TestCase):
+    """setUpでself.x, self.fsにload_audio()を読み込む"""
+
+    def setUp(self):
+        self.x, self.fs = load_audio()
+
+
+class ImpactTestCase(unittest.TestCase):
+    """setUpでself.x, self.fsにload_impact()を読み込む"""
+
+    def setUp(self):
+        self.x, self.fs = load_impact()
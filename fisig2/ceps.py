@@ -6,61 +6,93 @@ Created by 0160929 on 2016/03/23 14:29
 """
 __version__ = '0.0'
 
-import numpy as np
+from functools import lru_cache
 
+import numpy as np
 
-def ceps_gwt(gwtdata, lifter=5,  mode=None):
+try:
+    from .spectral import dct
+except ImportError:
+    from spectral import dct
+
+
+@lru_cache(maxsize=64)
+def _lifter_weight(K, lifter, mode):
+    """折り返した長さ2Kのリフタ(low: [1, 1, 1...0.0.0.0...1, 1, 1])の偶成分 (w[k] + w[2K - k]) / 2 (k = 0..K).
+    (K, lifter, mode)毎にキャッシュするので読み取り専用"""
+    assert 0 <= lifter <= K, "lifter:%r, K:%r" % (lifter, K)
+    n = 2 * K
+    k = np.arange(K + 1)
+    low = lambda i: ((i < lifter) | (i >= n - lifter)).astype(float)
+    w = (low(k) + low((n - k) % n)) / 2.
+    if mode == "high":
+        w = 1. - w
+    elif mode != "low":
+        raise ValueError("mode is not %r" % (mode,))
+    w.flags.writeable = False
+    return w
+
+
+def cepstrum(amp, workers=1):
     """
-    GWTのデータ配列からケプストラムを算出
-    dataは1次元配列のみ可能.
-    ※ ケプストラムには周波数軸上での折り返し成分が必要.
-    ※ GWTスペクトルには折り返し成分がないため、人為的に作成する。
-    :param data: 振幅スペクトル 1D-ndarray
-    :param lift: リフタリング次数
-    :param lift2: リフタリング次数. type='band'のときのみ利用。
-    :param mode: 'low', 'high', 'band'
-    :return: lifterd_data
+    振幅スペクトル<..., K>の周波数軸を折り返した長さ2Kのスペクトルのケプストラム real(ifft(log|折り返したスペクトル|))の
+    前半 c[0..K] (c[K] = 0, 後半は c[2K - k] = c[k]). 折り返しは偶対称なので長さKのDCT-IIで計算する.
+    :return: ceps ndarray<..., K + 1>
     """
+    logamp = np.log(np.abs(amp))
+    K = logamp.shape[-1]
+    k = np.arange(K)
+    ceps = np.zeros(logamp.shape[:-1] + (K + 1,))
+    ceps[..., :K] = dct(logamp, 2, workers) * (np.cos(np.pi * k / (2. * K)) / (2. * K))
+    return ceps
 
 
-    # 左側データ
-    gwt_left = np.atleast_2d(gwtdata)
-    # print gwt_left.shape
-
-    # 右側データの生成：(人為的に折り返す)
-    gwt_right = np.fliplr(gwt_left)
-    # print gwt_right.shape
-
-    # numpy.hstack() で列方向に結合
-    gwt_data = np.hstack((gwt_left, gwt_right))
-    # print gwt_data.shape
-
-    del gwt_right
-    del gwt_left
-    del gwtdata
-
-    # 周波数領域
-    FFT_abs = np.abs(gwt_data)
+def _inverse(ceps, workers=1):
+    """逆ケプストラム |exp(fft(リフタリングしたケプストラム))|. 偶関数のfftは実数でDCT-Iと同じ形"""
+    return np.exp(dct(ceps, 1, workers)[..., :ceps.shape[-1] - 1])
 
-    # ケプストラム
-    ceps = np.real(np.fft.ifft(np.log(FFT_abs)))
 
+def liftering(amp, lifter=5, mode="low", workers=1):
+    """
+    振幅スペクトル<..., K>(最後の軸が周波数)をまとめてリフタリングする.
+    ceps_gwtと同じく周波数軸を折り返した長さ2Kのスペクトルのケプストラムを考えるが,
+    折り返しは偶対称なので, 長さKのDCT-IIと長さK + 1のDCT-I(実数の変換)だけで計算する.
+    :param amp: 振幅スペクトル ndarray<..., K>. <time, frequency>のスペクトログラムは全フレームを一度に処理する
+    :param lifter: リフタリング次数
+    :param mode: 'low', 'high'
+    :param workers: DCTのスレッド数(scipy.fftがあるとき)
+    :return: lifterd_data ndarray<..., K>
+    """
+    ceps = cepstrum(amp, workers)
     # リフタリング
-    rown, cols = ceps.shape
-    Ceps_low = ceps.copy()
+    ceps *= _lifter_weight(ceps.shape[-1] - 1, lifter, mode)
+    return _inverse(ceps, workers)
 
-    if mode == "low":
-        #  "low [1, 1, 1...0.0.0.0...1, 1, 1]"
-        w = np.hstack((np.ones((rown, lifter)), np.zeros((rown, cols - 2 * lifter)), np.ones((rown, lifter))))
-    elif mode == "high":
-        #:  "high [0, 0, 0...1.1.1.1...0, 0, 0]"
-        w = np.hstack((np.zeros((rown, lifter)), np.ones((rown, cols - 2 * lifter)), np.zeros((rown, lifter))))
 
-    Ceps_low = Ceps_low * w
+def liftering_many(amp, lifters, workers=1):
+    """
+    ケプストラムを一度だけ計算して, 複数のリフタ[(lifter, mode), ...]でリフタリングする.
+    逆変換もまとめて1回のDCT-Iで計算する.
+        # >>> low5, low15, high13 = liftering_many(amp, [(5, "low"), (15, "low"), (13, "high")])
+    :param amp: 振幅スペクトル ndarray<..., K>
+    :param lifters: (リフタリング次数, 'low' or 'high')のリスト
+    :return: lifterd_data ndarray<len(lifters), ..., K>
+    """
+    ceps = cepstrum(amp, workers)
+    K = ceps.shape[-1] - 1
+    W = np.array([_lifter_weight(K, lifter, mode) for lifter, mode in lifters]).reshape(
+        (len(lifters),) + (1,) * (ceps.ndim - 1) + (K + 1,))
+    return _inverse(ceps * W, workers)
 
-    # 逆毛ぷす
-    Ceps_sspec = np.abs(np.exp(np.fft.fft(Ceps_low)))
 
-    # 反転成分除去(1次元データなので0インデックス)
-    Cepsed = Ceps_sspec[0, :cols / 2].T
-    return Cepsed
+def ceps_gwt(gwtdata, lifter=5,  mode=None):
+    """
+    GWTのデータ配列からケプストラムを算出
+    ※ ケプストラムには周波数軸上での折り返し成分が必要.
+    ※ GWTスペクトルには折り返し成分がないため、人為的に作成する(liftering()).
+    :param data: 振幅スペクトル 1D-ndarray. <time, frequency>の2D-ndarrayは各行をリフタリングする
+    :param lift: リフタリング次数
+    :param mode: 'low', 'high'
+    :return: lifterd_data
+    """
+    return liftering(gwtdata, lifter, mode)
@@ -23,10 +23,36 @@ def _load_wav(filepath, data_ch):
 
     del am
 
-    return data.copy(), fs, times
+    # getData()は新しい配列を返すのでコピーしない
+    return data, fs, times
+
+
+def _readonly(a, copy=False):
+    """aの読み取り専用のビュー(コピーしない). copy=Trueのときは書き換え可能なコピー"""
+    if copy:
+        return a.copy()
+    view = a.view()
+    view.flags.writeable = False
+    return view
 
 
 class BaseData(object):
+    """
+    get_amp(), get_pow(), get_logpow(), get_pow_norm(), get_logpow_norm()の結果は
+    スライス範囲とデータが変わるまでオブジェクト毎に保持し, 読み取り専用の配列で返す.
+    書き換えたいときは.copy()すること. memoize = Falseで従来通り毎回計算する(書き換え可能な配列を返す).
+
+    get_data(), get_xdata(), get_ydata()もスライス範囲の読み取り専用のビューを返す(コピーしない).
+    書き換え可能なコピーが欲しいときはcopy=Trueを指定する.
+    _set_data(), _set_xdata(), _set_ydata()は渡された配列をコピーせずにそのまま持つ(所有権を受け取る).
+    渡した後に呼び出し側で書き換えないこと. 必要ならcopy=Trueを指定する.
+
+        # >>> BaseData.memoize = False   # 全体で無効にする
+        # >>> spec.memoize = False       # このオブジェクトのみ
+    """
+    # 派生量(amp, pow, logpow, pow_norm)の保持
+    memoize = True
+
     def __init__(self):
         self._source_path = None
         self._fs = None
@@ -43,6 +69,11 @@ class BaseData(object):
 
         self.fig = None
 
+        # 派生量の保持. _memo_dataと_memo_key(スライス範囲)が今の値と同じ間だけ有効
+        self._memo = {}
+        self._memo_data = None
+        self._memo_key = None
+
         pass
 
     def info(self):
@@ -106,30 +137,67 @@ class BaseData(object):
     #: ----------------------------------------------------
     #: 物理量
     #: ----------------------------------------------------
-    def get_amp(self):
-        # return abs(self.get_data())
+    def _memoized(self, name, func):
+        """派生量nameをfunc()で計算して保持する. データ(_data)かスライス範囲が変わると捨てる"""
+        if not self.memoize:
+            return func()
+        key = (self._x_ss, self._x_es, self._y_ss, self._y_es)
+        # データは参照を持って比べる(idの使い回しで古い値を返さない)
+        if self._memo_data is not self._data or self._memo_key != key:
+            self._memo_clear()
+            self._memo_data = self._data
+            self._memo_key = key
+        if name not in self._memo:
+            value = func()
+            value.flags.writeable = False
+            self._memo[name] = value
+        return self._memo[name]
+
+    def _memo_clear(self):
+        """保持している派生量を捨てる. _dataをその場で書き換えたときに呼ぶ"""
+        self._memo = {}
+        self._memo_data = None
+        self._memo_key = None
+
+    def _data_view(self):
+        """スライス範囲のデータ(コピーしない)"""
+        if self._data.ndim == 1:
+            return self._data[self._x_ss:self._x_es]
+        elif self._data.ndim == 2:
+            return self._data[self._x_ss:self._x_es, self._y_ss:self._y_es]
+
+    def _amp(self, data):
+        """データの一部から振幅を計算する(dataは書き換えない)"""
         from numpy import clip
 
-        amp = abs(self.get_data())
+        amp = abs(data)
         # 最小値は20*log10(1e-8)=-160
         clip(amp, a_min=1e-8, a_max=1e32, out=amp)
         return amp
 
+    def get_amp(self):
+        return self._memoized("amp", lambda: self._amp(self._data_view()))
+
     def get_pow(self):
-        return self.get_amp() ** 2
+        return self._memoized("pow", lambda: self.get_amp() ** 2)
 
     def get_logamp(self):
         raise Warning("It is LogAmp 10log10(x) not LogPower 20log10(x)")
         return 10 * log10(self.get_amp())
 
     def get_logpow(self):
-        return 20 * log10(self.get_amp())
+        return self._memoized("logpow", lambda: 20 * log10(self.get_amp()))
 
     def get_pow_norm(self):
-        return self.get_pow() / sum(self.get_pow()) * self.get_pow().flatten().size
+        # 先頭の軸(時間)方向の和で正規化する(従来の組み込みsumと同じ)
+        def pow_norm():
+            power = self.get_pow()
+            return power / power.sum(axis=0) * power.size
+
+        return self._memoized("pow_norm", pow_norm)
 
     def get_logpow_norm(self):
-        return 20 * log10(self.get_pow_norm())
+        return self._memoized("logpow_norm", lambda: 20 * log10(self.get_pow_norm()))
 
     #: ----------------------------------------------------
     #: Getter
@@ -140,20 +208,17 @@ class BaseData(object):
     def get_fs(self):
         return self._fs
 
-    def get_data(self):
-        if self._data.ndim == 1:
-            return self._data[self._x_ss:self._x_es].copy()
-        elif self._data.ndim == 2:
-            return self._data[self._x_ss:self._x_es, self._y_ss:self._y_es].copy()
+    def get_data(self, copy=False):
+        return _readonly(self._data_view(), copy)
 
-    def get_xdata(self):
-        return self._xdata[self._x_ss:self._x_es].copy()
+    def get_xdata(self, copy=False):
+        return _readonly(self._xdata[self._x_ss:self._x_es], copy)
 
     def get_xlogdata(self):
         return 10 * log10(self.get_xdata())
 
-    def get_ydata(self):
-        return self._ydata[self._y_ss: self._y_es].copy()
+    def get_ydata(self, copy=False):
+        return _readonly(self._ydata[self._y_ss: self._y_es], copy)
 
     #: ----------------------------------------------------
     #: Setter
@@ -165,16 +230,16 @@ class BaseData(object):
     #: ----------------------------------------------------
     #: Private Setter
     #: ----------------------------------------------------
-    def _set_data(self, data):
-        self._data = data.copy()
+    def _set_data(self, data, copy=False):
+        self._data = data.copy() if copy else data
         return self
 
-    def _set_xdata(self, xdata):
-        self._xdata = xdata.copy()
+    def _set_xdata(self, xdata, copy=False):
+        self._xdata = xdata.copy() if copy else xdata
         return self
 
-    def _set_ydata(self, ydata):
-        self._ydata = ydata.copy()
+    def _set_ydata(self, ydata, copy=False):
+        self._ydata = ydata.copy() if copy else ydata
         return self
 
     def _set_fs(self, fs):
@@ -221,7 +286,8 @@ class BaseData(object):
         from .gwt import gwt
 
         """gwt analysis
-            gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None):
+            gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None, method="fft", cache=True, workers=1, roi=None,
+                ..., sigma=5, Vc=None, precision=None):
         """
         # print "_gwt", self.get_fs()
         return gwt(*args, **kw)
@@ -11,30 +11,705 @@ Reference:
     http://criticaldays2.blogspot.jp/2014/04/blog-post_23.html
     http://www.softist.com/programming/gabor-wavelet/gabor-wavelet.htm
 """
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
+try:
+    from .spectral import next_fast_len
+except ImportError:
+    from spectral import next_fast_len
+
+# FFTエンジンで一度に処理する周波数ビン数(カーネルバンクのメモリ上限)
+_BLOCK_SIZE = 32
+
+# 多重レート計算で, 間引き後の標本化周波数Fs_dに対して許すビン周波数の上限(f <= Q * Fs_d).
+# ガボールカーネルの帯域(~1.15f)がアンチエイリアスフィルタの通過域(0.3Fs_d)に収まる.
+_MULTIRATE_Q = 0.25
+# 有効計算幅Vcの既定値(従来の固定値). カーネルは振幅が中心のVc^(1/8)に下がる所で切る.
+_DEFAULT_VC = 0.00001
+# precision=のプリセットのVc. 打ち切りなしの畳み込み(閉形式のカーネル)に対する誤差の上限は
+# ピークから-40[dB]以内の点での最大|dB誤差|(test_gwt.TestGwtPrecisionで検証).
+#   "fast"     Vc=1e-16 (切る振幅 0.010)  6 [dB]
+#   "balanced" Vc=1e-24 (切る振幅 0.001)  0.5 [dB]
+#   "exact"    Vc=1e-32 (切る振幅 1e-4)   0.05 [dB]
+# 従来のVc=1e-5(切る振幅 0.24)は同じ条件で数十[dB]ずれる点がある.
+_PRECISION = {"fast": 1e-16, "balanced": 1e-24, "exact": 1e-32}
+_PRECISION_DB = {"fast": 6., "balanced": 0.5, "exact": 0.05}
+# method="iir"で係数式をそのまま使うガウス窓の最大幅[sample]. これより広い窓は極を伸ばして作る(_yvv_poles)
+_IIR_S0 = 20.
+# out指定時の時間方向のタイル[列]
+_OUT_TILE = 4096
+
+
+def _psi(a, b, a_t, sigma):
+    """ ガボール関数"""
+    t = (a_t - b) / a
+    g = 1. / (2 * np.sqrt(np.pi * sigma)) * np.exp(-1. * t ** 2 / (4. * sigma ** 2))
+    e = np.exp(1j * 2. * np.pi * t)
+    return g * e
+
+
+def _utili_sample(a, sigma, Vc):
+    samp = a * sigma * np.sqrt(-2. * np.log(Vc))
+    return samp
+
+
+def _blocks(n, size):
+    """[0, n)を幅sizeのブロック(s, e)に分割"""
+    return [(s, min(s + size, n)) for s in range(0, n, size)]
+
+
+def _half_support(fn, Fs, sigma, Vc, N=None):
+    """各ビンのカーネル半幅[sample]. Nを与えると従来通り信号長Nを超えない."""
+    us = np.floor(_utili_sample(1. / fn, sigma, Vc) * Fs)
+    h = np.floor(us / 2)
+    if N is not None:
+        h = np.minimum(h, (N - 1) // 2)
+    return h.astype(int)
+
+
+def _gabor_kernels(fn, Fs, sigma, h):
+    """中心0, 半幅hのサンプル格子上のガボールカーネル(1/sqrt(a)込み)
+
+    :return: kernels<len(fn), 2 * max(h) + 1>, 半幅外は0
+    """
+    H = int(h.max())
+    d = np.arange(-H, H + 1)
+    a = 1. / fn
+    kernels = _psi(a[:, None], 0., d[None, :] / Fs, sigma)
+    kernels *= (1. / np.sqrt(a))[:, None]
+    kernels[np.abs(d)[None, :] > h[:, None]] = 0.
+    return kernels
+
+
+def _kernel_spectra(fn, Fs, sigma, h, L, shift=0, dtype=complex):
+    """長さLの循環バッファに配置したカーネルのFFT <len(fn), L>
+
+    shift: カーネルを循環的に-shiftずらして置く. 畳み込み結果のshift番目が0番目に来る.
+    dtype: complex64のときは配置からFFTまで単精度で計算する.
+    """
+    H = int(h.max())
+    kernels = _gabor_kernels(fn, Fs, sigma, h)
+    buf = np.zeros((len(fn), L), dtype=dtype)
+    buf[:, (np.arange(-H, H + 1) - shift) % L] = kernels
+    return np.fft.fft(buf, axis=1)
+
+
+def _plan(fn, Fs, sigma, Vc, N, n0, n1, cap=True, hop=1):
+    """周波数ブロック毎の計算範囲
+
+    出力[n0, n1)に必要な入力は, ブロック内の最大半幅Hだけ外側の[n0 - H, n1 + H)まで.
+    信号[0, N)の外は0なので読まず, その分だけFFT長Lを伸ばして循環畳み込みの折り返しを避ける.
+    hop > 1 のときはスペクトルをhop個に折り返して間引くので, Lはhopの倍数にする.
+
+    cap=Trueのときは従来通り半幅を(N - 1) // 2までに制限する.
+    cap="full"のときは信号全体と重なる半幅N - 1まで(打ち切りはVcのみで決まる. precision=指定時).
+    cap=Falseのときはカーネル半幅を信号長で制限しない(ストリーム処理用).
+
+    :return: h, [(s, e, lo, hi, L), ...]
+    """
+    if cap == "full":
+        limit = 2 * N - 1
+    elif cap:
+        limit = N
+    else:
+        limit = None
+    h = _half_support(fn, Fs, sigma, Vc, limit)
+    plan = []
+    for s, e in _blocks(len(fn), _BLOCK_SIZE):
+        H = int(h[s:e].max())
+        lo, hi = max(0, n0 - H), min(N, n1 + H)
+        pad = max(lo - (n0 - H), (n1 + H) - hi)
+        plan.append((s, e, lo, hi, next_fast_len(-(-(hi - lo + pad) // hop)) * hop))
+    return h, plan
+
+
+def _kernel_bank(fn, Fs, sigma, h, plan, n0=0, dtype=complex):
+    """ブロック毎のカーネルスペクトル [<e - s, L>, ...]"""
+    return [_kernel_spectra(fn[s:e], Fs, sigma, h[s:e], L, n0 - lo, dtype) for s, e, lo, hi, L in plan]
+
+
+def _bank_key(Fs, fn, sigma, h, plan, n0=0, dtype=complex):
+    """カーネルバンクのキー.
+    周波数軸(a_N, f_min, f_max), 各ビンの半幅(N, Vc), ブロック毎のFFT長と配置はダイジェストで表す.
+    """
+    geometry = [(L, n0 - lo) for s, e, lo, hi, L in plan]
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(fn, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(h, dtype=np.int64).tobytes())
+    digest.update(np.array(geometry, dtype=np.int64).tobytes())
+    return float(Fs), float(sigma), np.dtype(dtype).str, digest.hexdigest()
+
+
+def _nbytes(bank):
+    return sum(b.nbytes for b in bank)
+
+
+def _bank_nbytes(plan, dtype):
+    """計画から見積もったカーネルバンクの大きさ Σ 行数 × L × itemsize(生成せずに分かる)"""
+    return sum((e - s) * L for s, e, lo, hi, L in plan) * np.dtype(dtype).itemsize
+
+
+class KernelBankCache(object):
+    """周波数領域のガボールカーネルバンクのキャッシュ
+
+    解析パラメータ(Fs, N, 周波数軸, sigma, Vc, 出力範囲)をキーとし, 合計がmax_bytesを超えると
+    最も長く使われていないものから破棄する(LRU).
+    1つでmax_bytesを超えるバンクは生成前に大きさを見積もって(fits)キャッシュを使わない.
+    そのときgwtはブロック毎にカーネルを作って捨てる(cache=Falseと同じ)ので, バンク全体を確保せず, ディスクにも書かない.
+    cache_dirを指定すると.npzとして保存するので, 別プロセスでも計算済みのバンクを使える.
+
+    使い方
+    ----
+
+        # >>> import gwt
+        # >>> gwt.set_kernel_cache(gwt.KernelBankCache(max_bytes=512 * 2 ** 20, cache_dir="./gwtcache"))
+        # >>> gwt.get_kernel_cache().stats()
+        # {'hits': 998, 'disk_hits': 1, 'misses': 1, 'skips': 0, 'banks': 1, 'nbytes': 23592960, 'max_bytes': 536870912}
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # max_bytesを超えるためキャッシュしなかった回数
+        self.skips = 0
+
+        self._banks = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def fits(self, nbytes):
+        """nbytesのバンクをキャッシュできるか. できないときは数えておく(stats()["skips"])"""
+        if nbytes <= self.max_bytes:
+            return True
+        with self._lock:
+            self.skips += 1
+        return False
+
+    def get(self, key, build):
+        """キーのバンクを返す. なければディスク, それもなければbuild()で生成する."""
+        with self._lock:
+            bank = self._banks.pop(key, None)
+            if bank is not None:
+                self._banks[key] = bank
+                self.hits += 1
+                return bank
+
+        bank = self._load(key)
+        if bank is None:
+            bank = build()
+            self._dump(key, bank)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.disk_hits += 1
+        # キャッシュ上の配列は共有されるため書き込み禁止
+        for b in bank:
+            b.flags.writeable = False
 
-def gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None):
-    def psi(a, b, a_t, sigma):
-        """ ガボール関数"""
-        t = (a_t - b) / a
-        g = 1. / (2 * np.sqrt(np.pi * sigma)) * np.exp(-1. * t ** 2 / (4. * sigma ** 2))
-        e = np.exp(1j * 2. * np.pi * t)
-        return g * e
+        with self._lock:
+            self._store(key, bank)
+        return bank
 
-    def utili_sample(a, sigma, Vc):
+    def clear(self):
+        """メモリ上のバンクを破棄(ディスク上のファイルは残す)"""
+        with self._lock:
+            self._banks.clear()
+            self._nbytes = 0
+        return self
 
-        samp = a * sigma * np.sqrt(-2. * np.log(Vc))
-        return samp
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "skips": self.skips,
+                    "banks": len(self._banks), "nbytes": self._nbytes, "max_bytes": self.max_bytes}
 
+    def _store(self, key, bank):
+        if key in self._banks or _nbytes(bank) > self.max_bytes:
+            return
+        self._banks[key] = bank
+        self._nbytes += _nbytes(bank)
+        while self._nbytes > self.max_bytes:
+            _, old = self._banks.popitem(last=False)
+            self._nbytes -= _nbytes(old)
+
+    def _path(self, key):
+        name = "gwtbank_%s.npz" % hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as f:
+            return [f["arr_%d" % i] for i in range(len(f.files))]
+
+    def _dump(self, key, bank):
+        if not self.cache_dir:
+            return
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # 他プロセスが書きかけのファイルを読まないよう, 一時ファイルから置き換える
+        path = self._path(key)
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "wb") as f:
+            np.savez(f, *bank)
+        os.replace(tmp, path)
+
+
+_kernel_cache = KernelBankCache()
+
+
+def get_kernel_cache():
+    return _kernel_cache
+
+
+def set_kernel_cache(cache):
+    global _kernel_cache
+    _kernel_cache = cache
+    return cache
+
+
+def _resolve_cache(cache):
+    """gwt(cache=...)の引数をKernelBankCacheまたはNoneにする"""
+    if cache is True:
+        return _kernel_cache
+    if cache is False:
+        return None
+    return cache
+
+
+def _out_dtype(dtype, output):
+    """形式outputの出力の型. "amp", "db"はfloat32, "mean"は積算するのでfloat64"""
+    if output == "complex":
+        return np.dtype(dtype)
+    return np.dtype(np.float64 if output == "mean" else np.float32)
+
+
+def _to_output(Z, out, output):
+    """複素数の結果Z<rows, n>を形式output("complex", "amp", "db", "mean")でoutに書き込む.
+    "db"は20log10|Z|で, 振幅の下限はBaseData.get_ampと同じ1e-8(-160dB).
+    "mean"は下限1e-8の振幅の時間平均で, outは<rows, 1>.
+    """
+    if output == "complex":
+        out[...] = Z
+        return out
+    if output == "mean":
+        out[..., 0] = np.maximum(np.abs(Z), 1e-8).mean(axis=-1)
+        return out
+    np.abs(Z, out=out)
+    if output == "db":
+        np.maximum(out, 1e-8, out=out)
+        np.log10(out, out=out)
+        out *= 20
+    return out
+
+
+def _gwt_fft(X, Fs, fn, sigma, Vc, cache=None, workers=1, n0=0, n1=None, cap=True, hop=1, gain=1.,
+             output="complex"):
+    """信号のFFTと周波数領域のカーネルバンクとの積を, 周波数ブロック毎に一括iFFTする.
+    出力は[n0, n1)のhop毎の列 n0, n0 + hop, ... だけ計算する(_plan参照).
+
+    hop > 1 のときは積のスペクトル(長さL)をL / hop本毎に足し合わせてから長さL / hopでiFFTする.
+    時間領域でhop毎に間引くことと等価で, 不要な時刻は計算しない.
+
+    workers > 1 のときは周波数ブロックをスレッドプールで並列に計算する.
+    FFTとNumPyの演算はGILを解放するので, 各ブロックは出力バッファの自分の行に直接書き込む.
+
+    Xがfloat32のときはカーネル, FFT, 出力ともcomplex64で計算する.
+    output="amp", "db"のときは出力をfloat32で持ち, 各ブロックのiFFT結果をその場で変換する
+    (全体の複素数配列は作らない). "mean"のときは出力は時間平均の1列のみ. gainは結果に掛ける係数.
+    """
+    N = X.shape[0]
+    dtype = np.result_type(X.dtype, np.complex64)
+    if n1 is None:
+        n1 = N
+    n_out = -(-(n1 - n0) // hop)
+    h, plan = _plan(fn, Fs, sigma, Vc, N, n0, n1, cap, hop)
+    # バンクがキャッシュに収まらないときは全体を作らず, ブロック毎にカーネルを作って捨てる
+    if cache is not None and cache.fits(_bank_nbytes(plan, dtype)):
+        bank = cache.get(_bank_key(Fs, fn, sigma, h, plan, n0, dtype),
+                         lambda: _kernel_bank(fn, Fs, sigma, h, plan, n0, dtype))
+    else:
+        bank = None
+
+    # 入力区間のFFTはブロック間で共有する(低域ブロックは同じ区間になりやすい)
+    Xfs = {}
+    for s, e, lo, hi, L in plan:
+        if (lo, hi, L) not in Xfs:
+            # 係数と折り返しの1 / hopは共有の信号スペクトルに掛けておく
+            Xfs[lo, hi, L] = np.fft.fft(X[lo:hi], L) * (gain / hop)
+
+    width = 1 if output == "mean" else n_out
+    Anadata = np.empty(shape=(len(fn), width), dtype=_out_dtype(dtype, output))
+
+    def _block(task):
+        b, r0, r1 = task
+        s, e, lo, hi, L = plan[b]
+        if bank is None:
+            K = _kernel_spectra(fn[r0:r1], Fs, sigma, h[r0:r1], L, n0 - lo, dtype)
+            K *= Xfs[lo, hi, L]
+        else:
+            K = bank[b][r0 - s:r1 - s] * Xfs[lo, hi, L]
+        if hop > 1:
+            K = K.reshape(r1 - r0, hop, L // hop).sum(axis=1)
+        _to_output(np.fft.ifft(K, axis=1)[:, :n_out], Anadata[r0:r1], output)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # 全スレッドに仕事が行き渡るようブロックを細かくする
+    size = max(1, min(_BLOCK_SIZE, -(-len(fn) // workers)))
+    tasks = [(b, s + r0, s + r1)
+             for b, (s, e, lo, hi, L) in enumerate(plan)
+             for r0, r1 in _blocks(e - s, size)]
+    if workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_block, tasks))
+    else:
+        for task in tasks:
+            _block(task)
+    return Anadata.T
+
+
+def _decimate2(x):
+    """1/2ポリフェーズ間引き. 通過域0.15Fs, 阻止域0.35Fs以上で-90dB."""
+    from scipy.signal import firwin, resample_poly
+
+    fir = firwin(31, 0.5, window=("kaiser", 8.6))
+    return resample_poly(x, 1, 2, window=fir).astype(x.dtype, copy=False)
+
+
+def _interp_rows(A, fn, Fs, d, out):
+    """間引き率dで計算した行Aを, 複素包絡の線形補間で元の時間軸のoutに書き込む
+
+    包絡 A[m] e^{-iωmd} を補間して再変調すると, 位相回転の係数は行毎にd個で済む:
+        y[md + r] = A[m] e^{iωr} + (A[m + 1] e^{-iωd} - A[m]) r / d e^{iωr}
+    出力は大きいので, 行×時間の小ブロック毎に一度だけ書き込む.
+    """
+    rows, N = out.shape
+    w = 2j * np.pi * fn[:, None] / Fs
+    r = np.arange(d)
+    P = np.exp(w * r).astype(out.dtype)
+    Q = P * (r / float(d))
+    delta = np.empty_like(A)
+    delta[:, :-1] = A[:, 1:] * np.exp(-w * d)
+    delta[:, -1] = A[:, -1]  # 終端は包絡をホールド
+    delta -= A
+
+    K = N // d
+    view = out[:, :K * d]
+    view.shape = (rows, K, d)  # コピーになる場合は例外
+    chunk = max(1, 8192 // d)
+    tmp = np.empty((chunk, d), dtype=out.dtype)
+    for i in range(rows):
+        for c, e in _blocks(K, chunk):
+            np.multiply(A[i, c:e, None], P[i], out=view[i, c:e])
+            np.multiply(delta[i, c:e, None], Q[i], out=tmp[:e - c])
+            view[i, c:e] += tmp[:e - c]
+
+    tail = N - K * d
+    if tail:
+        out[:, K * d:] = A[:, K, None] * P[:, :tail] + delta[:, K, None] * Q[:, :tail]
+    return out
+
+
+def _interp_at(A, fn, Fs, d, n):
+    """間引き率dで計算した行Aを, 元の時間軸の任意の時刻nで補間する(_interp_rowsと同じ式)"""
+    w = 2j * np.pi * fn[:, None] / Fs
+    m = n // d
+    r = n - m * d
+    last = m + 1 >= A.shape[1]
+    a0 = A[:, m]
+    a1 = A[:, np.minimum(m + 1, A.shape[1] - 1)] * np.exp(-w * d)
+    a1[:, last] = a0[:, last]  # 終端は包絡をホールド
+    P = np.exp(w * np.arange(d))
+    return (a0 + (a1 - a0) * (r / float(d))) * P[:, r]
+
+
+def _gwt_multirate(X, Fs, fn, sigma, Vc, cache=None, workers=1, n0=0, n1=None, hop=1, output="complex",
+                   pyramid=None, cap=True):
+    """オクターブ毎にポリフェーズで間引いた信号でGWTを計算する.
+
+    各ビンは fn <= _MULTIRATE_Q * Fs / D を満たす最大の2のべき D で間引いた信号で計算するので,
+    低域ほど短い信号・短いカーネルで済む. 間引いた行は_interp_rowsで元の時間軸に戻す.
+    出力時刻 n0, n0 + hop, ... が間引いた標本点に一致する行(n0, hopがDの倍数)は補間せず,
+    その時刻だけを_gwt_fftで計算する.
+    補間する行は_BLOCK_SIZE行毎に複素数で補間してからoutputの形式に変換する.
+    pyramid: 間引き率d -> 間引いた信号 の辞書. 渡すと呼び出し間で再利用する.
+    """
+    N = X.shape[0]
+    if n1 is None:
+        n1 = N
+    n_out = -(-(n1 - n0) // hop)
+    D = 2 ** np.floor(np.log2(_MULTIRATE_Q * Fs / fn)).clip(0).astype(int)
+    cdtype = np.result_type(X.dtype, np.complex64)
+
+    width = 1 if output == "mean" else n_out
+    Anadata = np.empty(shape=(len(fn), width), dtype=_out_dtype(cdtype, output))
+    if pyramid is None:
+        pyramid = {1: X}
+    d = 1
+    for Dv in np.unique(D):
+        while d < Dv:
+            d *= 2
+            if d not in pyramid:
+                pyramid[d] = _decimate2(pyramid[d // 2])
+        xd = pyramid[d]
+        rows = np.nonzero(D == Dv)[0]
+        # 標本化周波数がFs / dなので, 畳み込み和をd倍して元のスケールに合わせる
+        if n0 % d == 0 and hop % d == 0:
+            m0, q = n0 // d, hop // d
+            Anadata[rows] = _gwt_fft(xd, Fs / d, fn[rows], sigma, Vc, cache, workers,
+                                     m0, m0 + (n_out - 1) * q + 1, cap, hop=q, gain=d, output=output).T
+            continue
+        # 補間に使う間引いた時刻[m0, m1)だけ計算する(次の標本点まで. 時間タイル毎に全長を計算しない)
+        m0, m1 = n0 // d, min(xd.shape[0], (n1 - 1) // d + 2)
+        A = _gwt_fft(xd, Fs / d, fn[rows], sigma, Vc, cache, workers, m0, m1, cap, gain=d).T
+        contiguous = rows[-1] - rows[0] + 1 == len(rows)
+        for c, e in _blocks(len(rows), _BLOCK_SIZE):
+            sub = rows[c:e]
+            if contiguous:
+                out = Anadata[sub[0]:sub[-1] + 1]
+            else:
+                out = np.empty((e - c, width), dtype=Anadata.dtype)
+            if hop > 1 or n0 % d:
+                _to_output(_interp_at(A[c:e], fn[sub], Fs, d, np.arange(n0, n1, hop) - m0 * d), out, output)
+            elif output == "complex":
+                _interp_rows(A[c:e], fn[sub], Fs, d, out)
+            else:
+                Z = _interp_rows(A[c:e], fn[sub], Fs, d, np.empty((e - c, n_out), dtype=cdtype))
+                _to_output(Z, out, output)
+            if not contiguous:
+                Anadata[sub] = out
+    return Anadata.T
+
+
+def _yvv_poles(s):
+    """標準偏差s[sample]のガウス窓を近似する3次の再帰フィルタ(Young & van Vliet 1995)の極 <3>.
+
+    YvVの係数式はqが大きいと丸め誤差で極が崩れるので, s > _IIR_S0では s = _IIR_S0 の極を
+    z = exp(log(p) * _IIR_S0 / s) で時間方向に伸ばす(インパルス応答を相似に引き伸ばすことと等価).
+    """
+    if s < 0.5:
+        raise ValueError("method='iir' needs a Gaussian width >= 0.5 sample (s=%r)" % (s,))
+    s0 = min(s, _IIR_S0)
+    if s0 >= 2.5:
+        q = 0.98711 * s0 - 0.96330
+    else:
+        q = 3.97156 - 4.14554 * np.sqrt(1 - 0.26891 * s0)
+    b0 = 1.57825 + 2.44413 * q + 1.4281 * q ** 2 + 0.422205 * q ** 3
+    b1 = 2.44413 * q + 2.85619 * q ** 2 + 1.26661 * q ** 3
+    b2 = -(1.4281 * q ** 2 + 1.26661 * q ** 3)
+    b3 = 0.422205 * q ** 3
+    p0 = np.roots([1., -b1 / b0, -b2 / b0, -b3 / b0]).astype(complex)
+    return np.exp(np.log(p0) * (s0 / s))
+
+
+def _gauss_iir(Y, s):
+    """Y<..., N>の最終軸を標準偏差s[sample]のガウス窓(直流利得1)で平滑化する. 計算量はsによらずO(N).
+
+    因果・反因果の3次フィルタを複素1次の並列和 A_j / (1 - p_j z^-1) に分けてlfilterで計算する.
+    信号の外は0として, 反因果側の初期値は因果側の出力の減衰(p_j^k)から閉じた形で求める.
+    """
+    from scipy.signal import lfilter
+
+    p = _yvv_poles(s)
+    A = np.prod(1 - p) / np.array([np.prod([1 - p[k] / p[j] for k in range(3) if k != j]) for j in range(3)])
+    U = [lfilter([A[j]], [1, -p[j]], Y, axis=-1) for j in range(3)]
+    R = sum(U)[..., ::-1]
+    V = 0
+    for i in range(3):
+        # 反因果側の n = N の値: A_i * Σ_k p_i^k u[N + k], u[N - 1 + k] = Σ_j U_j[N - 1] p_j^k
+        v_end = A[i] * sum(U[j][..., -1] * p[j] / (1 - p[i] * p[j]) for j in range(3))
+        V = V + lfilter([A[i]], [1, -p[i]], R, axis=-1, zi=(p[i] * v_end)[..., None])[0]
+    return V[..., ::-1]
+
+
+def _gwt_iir(X, Fs, fn, sigma, n0=0, n1=None, hop=1, output="complex", out=None):
+    """再帰フィルタ(IIRガウス窓)によるガボールウェーブレット変換.
+
+    W(n) = Σ_m x(m) g(n - m) e^{iω(n - m)} = e^{iωn} Σ_m (x(m) e^{-iωm}) g(n - m)
+    なので, 各ビンで信号を復調してガウス窓(標準偏差 s = sqrt(2) * sigma * Fs / f)で平滑化し, 再び変調する.
+    カーネルを打ち切らない(信号全体と重なる)ので, precision="exact"のFFTエンジンに近い.
+    1ビンの計算量は信号長Nのみに比例し, 周波数・sigmaによらない.
+    lfilterはGILを解放しないので, workersによる並列化はしない.
+    :param out: 出力先<len(fn), n_out>(省略時は確保する)
+    :return: <n_out, len(fn)>
+    """
+    N = X.shape[0]
+    if n1 is None:
+        n1 = N
+    n = np.arange(N)
+    if out is None:
+        width = 1 if output == "mean" else len(range(n0, n1, hop))
+        out = np.empty((len(fn), width),
+                       dtype=_out_dtype(np.result_type(X.dtype, np.complex64), output))
+
+    for i, f in enumerate(fn):
+        s = np.sqrt(2.) * sigma * Fs / f
+        # _psiの振幅 1 / (2 sqrt(pi sigma)) / sqrt(a) とガウス窓の和 sqrt(2 pi) s
+        gain = 1. / (2 * np.sqrt(np.pi * sigma)) * np.sqrt(2 * np.pi) * s * np.sqrt(f)
+        e = np.exp(-2j * np.pi * f / Fs * n)
+        Y = _gauss_iir(X * e, s)[n0:n1:hop]
+        Y *= gain * e[n0:n1:hop].conj()
+        _to_output(Y, out[i], output)
+    return out.T
+
+
+def _gwt_direct(X, Fs, t, fn, sigma, Vc):
+    """従来の時間領域畳み込み(np.convolve)による実装. 比較用."""
+    N = X.shape[0]
+
+    def _subfun(t, sigma, Vc, N, a_n):
+        "0.65s"
+        a = 1. / fn[a_n]
+        b = 1. * N / 2. / Fs
+        Psi = _psi(a, b, t, sigma)
+
+        # 実用領域のみ畳み込み
+        us = np.floor(_utili_sample(a, sigma, Vc) * Fs)
+        if us < N:
+            ss = int(np.floor(N / 2 - us / 2))
+            se = int(np.floor(N / 2 + us / 2))
+            Psi = Psi[ss:se]
+
+        return (1. / np.sqrt(a)) * np.convolve(X, Psi, 'same')
+
+    Anadata = [_subfun(t, sigma, Vc, N, a_n) for a_n in range(0, len(fn))]
+    return np.array(Anadata).T
+
+
+def _resolve_precision(Vc, precision):
+    """Vc, precisionから打ち切り閾値Vcとカーネル半幅の上限(_planのcap)を決める.
+    precision指定時は信号長による従来の打ち切り((N - 1) // 2)をせず, Vcのみで打ち切る.
+    """
+    if precision is None:
+        return (_DEFAULT_VC if Vc is None else Vc), True
+    if Vc is not None:
+        raise ValueError("Vc and precision cannot be given together")
+    if precision not in _PRECISION:
+        raise ValueError("precision is not %r" % (precision,))
+    return _PRECISION[precision], "full"
+
+
+def _freq_axis(Fs, a_N, f_min, f_max, scale, freqs=None, band=None):
+    """解析周波数 fn[Hz]"""
+    if f_max is None:
+        f_max = Fs / 2
+    if scale not in ("linear", "log"):
+        raise ValueError("scale is not %r" % (scale,))
+    if freqs is not None:
+        fn = np.array(freqs, dtype=float).ravel()
+    elif band is not None:
+        f_lo, f_hi = band
+        fn = (np.linspace if scale == "linear" else np.geomspace)(f_lo, f_hi, a_N)
+    elif scale == "linear":
+        # f_minは含まない(既定のf_min=0では f_max / a_N から)
+        fn = np.linspace(f_min, f_max, a_N + 1)[1:]
+    else:
+        if not f_min > 0:
+            raise ValueError("scale='log' needs f_min > 0 (f_min=%r)" % (f_min,))
+        fn = np.geomspace(f_min, f_max, a_N)
+    if not (fn.size and fn.min() > 0):
+        raise ValueError("frequencies must be > 0 (fn=%r)" % (fn,))
+    return fn
+
+
+def gwt_cost(N, Fs, a_N=512, f_min=0, f_max=None, scale="linear", freqs=None, band=None, sigma=5, Vc=None,
+             precision=None):
+    """長さNの信号をgwt(method="fft", multirate=False)で解析するときのカーネル長と計算量の見積もり
+
+        # >>> for p in ("fast", "balanced", "exact"):
+        # ...     c = gwt_cost(1920, 48000, precision=p)
+        # ...     print(p, c["max_taps"], c["flops"])
+
+    :return: dict(taps=各ビンのカーネル長[sample], max_taps, mean_taps,
+                  fft_points=Σ(ビン数×FFT長), flops=複素積とiFFTの概算浮動小数点演算数)
+    """
+    Fs = float(Fs)
+    fn = _freq_axis(Fs, a_N, f_min, f_max, scale, freqs, band)
+    Vc, cap = _resolve_precision(Vc, precision)
+    h, plan = _plan(fn, Fs, sigma, Vc, N, 0, N, cap)
+    taps = 2 * h + 1
+    rows = np.array([e - s for s, e, lo, hi, L in plan])
+    Ls = np.array([L for s, e, lo, hi, L in plan])
+    return dict(taps=taps, max_taps=int(taps.max()), mean_taps=float(taps.mean()),
+                fft_points=int(np.sum(rows * Ls)),
+                flops=float(np.sum(rows * Ls * (5 * np.log2(Ls) + 6))))
+
+
+def gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None, method="fft", cache=True, workers=1, roi=None,
+        scale="linear", multirate=False, hop=1, dtype=complex, output="complex", out=None, freqs=None,
+        band=None, sigma=5, Vc=None, precision=None):
+    """ガボールウェーブレット変換
+
+    :param method: "fft" 周波数領域での一括畳み込み(既定)
+                   "direct" 周波数ビン毎のnp.convolve(従来実装)
+                   "iir" 復調した信号を再帰フィルタのガウス窓で平滑化する(_gwt_iir).
+                   1ビンの計算量が周波数・sigmaによらずO(N)なので, 低域のカーネルが長いときに速い.
+                   カーネルは打ち切らず(Vc, precisionは使わない), ガウス窓の近似誤差は形状で約1.5%.
+    :param cache: True 共有のKernelBankCacheを使う, False 使わない,
+                  KernelBankCacheのインスタンス そのキャッシュを使う
+    :param workers: method="fft"の並列スレッド数. Noneでos.cpu_count()
+    :param roi: (ss, se) 出力するサンプル範囲. 範囲外の列は計算しない.
+                結果は全体を解析して[ss:se]を切り出したものと同じ.
+    :param scale: "linear" f_min + (f_max - f_min) / a_N から f_max まで等間隔(f_min=0で従来と同じ)
+                  "log" f_min(>0) から f_max まで対数等間隔(定Q)
+    :param freqs: 解析周波数の配列[Hz](>0). 指定した周波数のカーネル・畳み込みだけを計算する.
+                  a_N, f_min, f_max, scaleより優先
+    :param band: (f_lo, f_hi) この帯域(両端を含む)をa_N本に分けて解析する. 間隔はscaleに従う
+    :param multirate: オクターブ毎に間引いた信号で計算する(_gwt_multirate, method="fft"のみ).
+                      既定はFalse. 実測(a_N=512, f_min=50, scale="log", complex64)では
+                      N=1920で18.8 vs 14.5[ms], N=48000で407 vs 385[ms]と全レート計算より遅く,
+                      アンチエイリアスフィルタの分だけ誤差もあるため, 明示したときだけ使う.
+    :param sigma: ガボールウェーブレットのパラメータ(既定5). 大きいほど周波数分解能が高く時間分解能が低い
+    :param Vc: 有効計算幅の閾値(既定1e-5). 小さいほどカーネルが長く精度が高い. precisionとは同時に指定できない
+    :param precision: "fast", "balanced", "exact". Vcのプリセット(_PRECISION).
+                      信号長によるカーネルの打ち切りをせず, 打ち切りなしの畳み込みに対する
+                      最大dB誤差(ピークから-40[dB]以内)をそれぞれ 6, 0.5, 0.05[dB] 以下にする.
+                      method="direct"では信号長による打ち切りは従来のまま.
+                      カーネル長と計算量はgwt_cost()で見積もれる.
+    :param hop: 出力の時間間隔[sample]. 結果は[ss:se:hop]と同じだが, method="fft"では
+                間引いた時刻だけを計算する.
+    :param dtype: 出力の型. complex(complex128, 既定) または complex64.
+                  complex64のときは信号をfloat32にし, カーネル・FFT・出力とも単精度で計算する
+                  (method="direct"は畳み込みが倍精度のまま, 出力のみcomplex64).
+    :param output: "complex" 複素数(既定)
+                   "amp" 振幅|W|, "db" 20log10|W| をfloat32で返す. method="fft"では
+                   周波数ブロック毎に変換するので, 全体の複素数配列は作らない.
+                   "mean" 振幅の時間平均 <1, a_N>(float64). 出力範囲はroiで指定する.
+                   SpectrogramData.time_average()と同じ値を, ブロック毎に積算して求める.
+    :param out: 出力先. 配列<len(t), a_N> または .npyファイルのパス(np.lib.format.open_memmapで作成).
+                method="fft"では_OUT_TILE列毎に計算して書き込むので, 信号長によらず作業領域は一定.
+    :return: Anadata<N, a_N>, t, fn (roi, hop指定時はAnadata<len(t), a_N>, t[ss:se:hop])
+             out指定時のAnadataはout
+    """
     import time
 
     start = time.time()
 
     Fs = float(Fs)
     adata = audio_data
-    N = len(adata)
-    X = np.array(adata) * 1.
+    dtype = np.dtype(dtype)
+    if dtype not in (np.complex64, np.complex128):
+        raise ValueError("dtype is not %r" % (dtype,))
+    if output not in ("complex", "amp", "db", "mean"):
+        raise ValueError("output is not %r" % (output,))
+    X = np.array(adata, dtype=np.float32 if dtype == np.complex64 else float)
+    if X.ndim != 1:
+        raise ValueError("audio_data must be <N> (shape=%r)" % (X.shape,))
+    N = X.shape[0]
 
     # -------------------
     # ウェーブレット変換処理
@@ -42,17 +717,11 @@ def gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None):
     """
         解析パラメータ
     """
-    # 1. ガボールウェーブレットパラメータ
-    sigma = 5
+    # 1. ガボールウェーブレットパラメータ sigma (ver2.xから引数で定義)
     # 2. 周波数分割数
     # a_N = 512 (ver2.0から引数で定義)
-    # 解析周波数(最低周波数)
-    f_min = 0
-    # 解析周波数(最高周波数)
-    if f_max == None:
-        f_max = Fs / 2
-    # 有効計算幅(小さいほど精度高い)
-    Vc = 0.00001
+    # 3. 有効計算幅 Vc(小さいほど精度高い) または precision
+    Vc, cap = _resolve_precision(Vc, precision)
 
     # ループ準備
     # ---------
@@ -60,10 +729,8 @@ def gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None):
     # t = np.arange(0, N) / float(Fs)
     t = np.linspace(0, N / Fs, N)
     # 解析周波数
-    _fn = np.linspace(f_min, f_max, a_N + 1)
-    fn = _fn[1:]
-    # 解析結果格納バッファ
-    Anadata = np.empty(shape=(N, a_N), dtype=complex)
+    fn = _freq_axis(Fs, a_N, f_min, f_max, scale, freqs, band)
+    multirate = multirate and method == "fft"
 
     # print "-----------------------------"
     # print '== Gabor Wavelet Analysing =='
@@ -73,40 +740,57 @@ def gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None):
     # print '== f[0]=%r, f[1]=%r, f[-1]=%r' % (fn[0], fn[1], fn[-1])
     # print '== ...'
 
-    # for a_n in range(0, a_N):
-    #     "0.68s"
-    #     a = 1. / fn[a_n]
-    #     b = 1. * N / 2. / Fs
-    #     Psi = psi(a, b, t, sigma)
-    #
-    #     # 実用領域のみ畳み込み
-    #     us = np.floor(utili_sample(a, sigma, Vc) * Fs)
-    #     if us < N:
-    #         ss = np.floor(N / 2 - us / 2)
-    #         se = np.floor(N / 2 + us / 2)
-    #         Psi = Psi[ss:se]
-    #
-    #     # 畳み込み (convolve)
-    #     Anadata[:, a_n] = (1. / np.sqrt(a)) * np.convolve(X, Psi, 'same')
+    cache = _resolve_cache(cache)
 
-    def _subfun(t, sigma, Vc, N, a_n):
-        "0.65s"
-        a = 1. / fn[a_n]
-        b = 1. * N / 2. / Fs
-        Psi = psi(a, b, t, sigma)
+    if roi is None:
+        ss, se = 0, N
+    else:
+        ss, se = int(roi[0]), int(roi[1])
+        if not 0 <= ss < se <= N:
+            raise ValueError("roi must be 0 <= ss < se <= N (roi=%r, N=%r)" % (roi, N))
+    hop = int(hop)
+    if hop < 1:
+        raise ValueError("hop must be >= 1 (hop=%r)" % (hop,))
 
-        # 実用領域のみ畳み込み
-        us = np.floor(utili_sample(a, sigma, Vc) * Fs)
-        if us < N:
-            ss = np.floor(N / 2 - us / 2)
-            se = np.floor(N / 2 + us / 2)
-            Psi = Psi[ss:se]
+    if method not in ("fft", "direct", "iir"):
+        raise ValueError("method is not %r" % (method,))
 
-        return (1. / np.sqrt(a)) * np.convolve(X, Psi, 'same')
+    shape = (1 if output == "mean" else len(range(ss, se, hop)), len(fn))
+    odtype = _out_dtype(dtype, output)
+    if isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode="w+", dtype=odtype, shape=shape)
+    elif out is not None:
+        assert out.shape == shape, "out.shape:%r, expected:%r" % (out.shape, shape)
+
+    # 間引いた信号は時間タイル間で共有する
+    pyramid = {1: X}
 
-    Anadata = [_subfun(t, sigma, Vc, N, a_N) for a_n in range(0, a_N)]
-    Anadata = np.array(Anadata).T
+    def _run(n0, n1):
+        if multirate:
+            return _gwt_multirate(X, Fs, fn, sigma, Vc, cache, workers, n0, n1, hop, output, pyramid, cap)
+        return _gwt_fft(X, Fs, fn, sigma, Vc, cache, workers, n0, n1, cap, hop=hop, output=output)
 
+    if method == "iir":
+        # 1ビンずつ全時刻を計算して書き込む(作業領域は信号長分のみなのでタイル分割しない)
+        Anadata = np.empty(shape, dtype=odtype) if out is None else out
+        _gwt_iir(X, Fs, fn, sigma, ss, se, hop, output, Anadata.T)
+    elif method == "direct":
+        Z = _gwt_direct(X, Fs, t, fn, sigma, Vc)[ss:se:hop]
+        Anadata = np.empty(shape, dtype=odtype) if out is None else out
+        _to_output(Z.T, Anadata.T, output)
+    elif out is None:
+        Anadata = _run(ss, se)
+    elif output == "mean":
+        out[...] = _run(ss, se)
+        Anadata = out
+    else:
+        # 出力先が与えられたときは時間方向のタイル毎に計算して書き込む(作業領域はタイル分のみ)
+        for c, e in _blocks(shape[0], _OUT_TILE):
+            out[c:e] = _run(ss + c * hop, min(se, ss + e * hop))
+        Anadata = out
+    if isinstance(Anadata, np.memmap):
+        Anadata.flush()
+    t = t[ss:se:hop]
 
     # 解析時間
     # print '== return spectrum<%r : % r>, trange, frange' % Anadata.shape
@@ -115,6 +799,228 @@ def gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None):
 
     return Anadata, t, fn
 
+
+def gwt_adaptive(audio_data, Fs, a_N=64, refine=8, threshold_db=-20., f_min=0, f_max=None, scale="linear", **kw):
+    """粗い周波数軸で解析し, パワーの大きい帯域だけ細かい周波数軸で解析を追加する(coarse-to-fine).
+
+    1. a_N本の粗い軸で解析する.
+    2. 各ビンの時間平均パワーがピークのビンからthreshold_db[dB]以上なら, そのビンの近傍
+       (粗い軸で最も近いビンがそれになる範囲)をrefine倍の細かい軸で追加解析する.
+    細かい軸は粗い軸を含む(線形: a_N * refine本, 対数: (a_N - 1) * refine + 1本)ので, 返す各列は
+    細かい軸で全体をgwt()したときの同じ周波数の列と一致する.
+
+        # >>> A, t, fn = gwt_adaptive(x, fs, a_N=64, refine=8, threshold_db=-20)
+        # >>> fn.size   # 64 <= fn.size <= 512, 不等間隔の昇順
+
+    :param refine: 細かい軸の倍率
+    :param threshold_db: 細かく解析するビンのパワーの閾値(ピーク比)[dB]
+    その他の引数はgwt()と同じ(freqs, band, outは指定できない)
+    :return: Anadata<len(t), len(fn)>, t, fn(昇順の不等間隔)
+    """
+    for name in ("freqs", "band", "out"):
+        if kw.get(name) is not None:
+            raise ValueError("gwt_adaptive does not accept %s=" % (name,))
+    refine = int(refine)
+    if refine < 1:
+        raise ValueError("refine must be >= 1 (refine=%r)" % (refine,))
+    Fs = float(Fs)
+    if scale == "linear":
+        dense = _freq_axis(Fs, a_N * refine, f_min, f_max, scale)
+        coarse = np.arange(refine - 1, dense.size, refine)
+    else:
+        dense = _freq_axis(Fs, (a_N - 1) * refine + 1, f_min, f_max, scale)
+        coarse = np.arange(0, dense.size, refine)
+    A, t, fc = gwt(audio_data, Fs, freqs=dense[coarse], scale=scale, **kw)
+
+    # 時間平均のパワー
+    output = kw.get("output", "complex")
+    if output == "complex":
+        power = np.abs(A) ** 2
+    elif output == "db":
+        power = 10 ** (A / 10.)
+    else:
+        power = np.asarray(A, dtype=float) ** 2
+    power = power.mean(axis=0)
+    selected = 10 * np.log10(np.maximum(power, 1e-300) / power.max()) >= threshold_db
+    nearest = np.abs(np.arange(dense.size)[:, None] - coarse[None, :]).argmin(axis=1)
+    fine = np.setdiff1d(np.flatnonzero(selected[nearest]), coarse)
+    if fine.size == 0:
+        return A, t, fc
+    B = gwt(audio_data, Fs, freqs=dense[fine], scale=scale, **kw)[0]
+    index = np.concatenate((coarse, fine))
+    order = np.argsort(index)
+    return np.concatenate((A, B), axis=1)[:, order], t, dense[index[order]]
+
+
+def gwt_batch(clips, Fs, cache=True, out=None, stack=True, **kw):
+    """同じ長さのクリップ<clips, N>(または1次元配列のリスト)をgwt()で解析する.
+
+    カーネルバンクは最初のクリップで1回だけ作り, 残りのクリップはそれを使う.
+    cache=Falseのときもこの呼び出しの間だけのKernelBankCacheに持つので, クリップ毎には作り直さない.
+    FFT・iFFTはクリップ毎に計算する(クリップ軸でまとめてもiFFTの1行あたりの時間は変わらない).
+
+        # >>> A, t, fn = gwt_batch(clips, fs, a_N=512, roi=(960, 1200))   # A<clips, len(t), 512>
+
+    :param cache: gwt()と同じ. Falseのときは呼び出し毎のKernelBankCache
+    :param out: 出力先. 配列<clips, len(t), a_N> または .npyファイルのパス(np.lib.format.open_memmapで作成)
+    :param stack: Falseのときはクリップ毎のgwt()の結果<len(t), a_N>のリストを返す(まとめるコピーをしない)
+    その他の引数はgwt()と同じ
+    :return: Anadata<clips, len(t), a_N>, t, fn
+    """
+    X = np.asarray(clips)
+    if X.ndim != 2 or X.shape[0] == 0:
+        raise ValueError("clips must be <clips, N> of the same length (shape=%r)" % (X.shape,))
+    if cache is False or cache is None:
+        cache = KernelBankCache()
+
+    results = []
+    for x in X:
+        A, t, fn = gwt(x, Fs, cache=cache, **kw)
+        results.append(A)
+    if not stack and out is None:
+        return results, t, fn
+
+    shape = (X.shape[0],) + A.shape
+    if isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode="w+", dtype=A.dtype, shape=shape)
+    elif out is not None and out.shape != shape:
+        raise ValueError("out.shape:%r, expected:%r" % (out.shape, shape))
+    if out is None:
+        # gwt()の結果は<len(fn), len(t)>の転置なので, 同じ並びで持って転置を返す(行単位のコピーで済む)
+        Anadata = np.empty((X.shape[0],) + A.T.shape, dtype=A.dtype)
+        for i, A in enumerate(results):
+            Anadata[i] = A.T
+        return np.swapaxes(Anadata, 1, 2), t, fn
+    for i, A in enumerate(results):
+        out[i] = A
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out, t, fn
+
+
+class GwtStream(object):
+    """サンプルを追加する毎に, 確定した列(カーネルの範囲の入力が揃った列)だけを返すガボールウェーブレット変換
+
+    列nはx[n - H, n + H]が揃った時点で確定する(Hは最長カーネルの半幅). 保持する入力は
+    未確定の列の分と両側のHのみ(push後は高々2 * Hサンプル)で, 信号長には依存しない.
+    1回のpushの計算量は新しいサンプル数nに対して, 各ビンで長さ~(n + 2 * H)のFFT程度.
+    タイルの列数は2のべき(最大block)に丸めるので, カーネルバンクはその数だけキャッシュされる.
+
+    返す列を連結したものは gwt(全信号)[0] と一致する
+    (信号が最長カーネルより長く, gwt()側のカーネルが信号長で切られない場合).
+
+    使い方
+    ----
+
+        # >>> stream = GwtStream(fs, a_N=128, f_max=8000)
+        # >>> for chunk in chunks:
+        # ...     columns = stream.push(chunk)        # <確定した列数, 128>
+        # ...     print(stream.pos, columns.shape)    # stream.posは次に返す列のサンプル番号
+        # >>> columns = stream.flush()                # 信号の後ろを0として残りの列
+
+    :param block: 1回のFFTで計算する最大列数. 大きなpushはblock列毎に分けて計算する
+    :param dtype, output: gwt()と同じ(outputは"complex", "amp", "db")
+    その他の引数はgwt()と同じ(カーネルは信号長で切らない)
+    """
+
+    def __init__(self, Fs, a_N=512, f_min=0, f_max=None, scale="linear", freqs=None, band=None, sigma=5, Vc=None,
+                 precision=None, block=8192, cache=True, workers=1, dtype=complex, output="complex"):
+        if output not in ("complex", "amp", "db"):
+            raise ValueError("output is not %r" % (output,))
+        self.Fs = float(Fs)
+        self.fn = _freq_axis(self.Fs, a_N, f_min, f_max, scale, freqs, band)
+        self.sigma = sigma
+        self.Vc = _resolve_precision(Vc, precision)[0]
+        self.block = int(block)
+        self.cache = _resolve_cache(cache)
+        self.workers = workers
+        self.output = output
+        self.H = int(_half_support(self.fn, self.Fs, sigma, self.Vc).max())
+        self._rdtype = np.float32 if np.dtype(dtype) == np.complex64 else float
+        self._odtype = _out_dtype(np.result_type(self._rdtype, np.complex64), output)
+        # _buf[H]が次に出力する列(サンプル番号pos). 信号の先頭より前は0.
+        self._buf = np.zeros(self.H, dtype=self._rdtype)
+        self._closed = False
+        self.pos = 0
+
+    def push(self, samples):
+        """samplesを追加し, 新しく確定した列 <n, len(fn)> を返す(nは0のこともある)."""
+        if self._closed:
+            raise ValueError("GwtStream is already flushed")
+        self._append(samples)
+        return self._emit(self.ready())
+
+    def flush(self):
+        """信号の終わりとして, 残りの列 <n, len(fn)> を返す(以降pushできない)."""
+        self._closed = True
+        return self._emit(self.ready())
+
+    def ready(self):
+        """確定していてまだ返していない列数"""
+        right = self.H if self._closed else 2 * self.H
+        return max(0, self._buf.size - right)
+
+    def _append(self, samples):
+        self._buf = np.concatenate((self._buf, np.asarray(samples, dtype=self._rdtype).ravel()))
+
+    def _emit(self, n):
+        """確定した先頭n列を計算して返し, 不要になった入力を捨てる"""
+        H = self.H
+        tiles = [np.empty((0, len(self.fn)), dtype=self._odtype)]
+        for c, e in _blocks(n, self.block):
+            # 列数を2のべきに丸めて計画(FFT長)の種類を抑える. 足りない入力は0(確定した列には影響しない)
+            m = min(self.block, 1 << int(np.ceil(np.log2(e - c))))
+            seg = self._buf[c:c + m + 2 * H]
+            if seg.size < m + 2 * H:
+                seg = np.concatenate((seg, np.zeros(m + 2 * H - seg.size, dtype=self._rdtype)))
+            tiles.append(_gwt_fft(seg, self.Fs, self.fn, self.sigma, self.Vc, self.cache, self.workers, H, H + m,
+                                  cap=False, output=self.output)[:e - c])
+        self._buf = self._buf[n:]
+        self.pos += n
+        return np.concatenate(tiles) if n else tiles[0]
+
+
+def gwt_stream(blocks, Fs, a_N=512, f_min=0, f_max=None, block=8192, cache=True, workers=1, dtype=complex,
+               output="complex", sigma=5, Vc=None, precision=None):
+    """ブロック入力のガボールウェーブレット変換(overlap-save)
+
+    長時間の録音を一度に読み込まずに解析する. 入力blocksは任意長の1次元配列の列で,
+    出力は最大block列のタイル毎に返す. 保持するのは最長カーネルの半幅Hを両側に足した
+    block + 2 * H サンプルの入力と1タイル分の出力のみで, 信号長には依存しない.
+    (入力が届く毎に確定した列を返したいときはGwtStreamを使う)
+
+    タイルを連結したものは gwt(全信号)[0] と一致する
+    (信号が最長カーネルより長く, gwt()側のカーネルが信号長で切られない場合).
+
+    使い方
+    ----
+
+        # >>> import wave
+        # >>> wf = wave.open("long.wav")
+        # >>> chunks = (np.frombuffer(wf.readframes(4096), dtype=np.int16) for _ in range(wf.getnframes() // 4096 + 1))
+        # >>> for tile, ss in gwt_stream(chunks, wf.getframerate()):
+        # ...     print(ss, tile.shape)
+
+    :param blocks: 入力信号ブロックのイテラブル
+    :param block: 1タイルの列数[sample]
+    :param dtype: gwt()と同じ. complex64のとき入力バッファもfloat32で持つ
+    :param output: gwt()と同じ
+    :param sigma, Vc, precision: gwt()と同じ(カーネルはもともと信号長で切らない)
+    :return: (Anadata<n, a_N>, ss) のジェネレータ. ssはタイル先頭のサンプル番号
+    """
+    stream = GwtStream(Fs, a_N, f_min, f_max, sigma=sigma, Vc=Vc, precision=precision, block=block, cache=cache,
+                       workers=workers, dtype=dtype, output=output)
+    for chunk in blocks:
+        stream._append(chunk)
+        while stream.ready() >= block:
+            ss = stream.pos
+            yield stream._emit(block), ss
+    stream._closed = True
+    while stream.ready():
+        ss = stream.pos
+        yield stream._emit(min(block, stream.ready())), ss
+
+
 # ******************************************
 #
 #  Demo
@@ -96,31 +96,167 @@ class SignalData(BaseData):
     #: Analys
     #: ----------------------------------------------------
     def gwt(self, *args, **kw):
-        """gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None):"""
+        """gwt(audio_data, Fs, a_N=512, f_min=0, f_max=None, method="fft", cache=True, workers=1, roi=None,
+               scale="linear", multirate=False, hop=1, dtype=complex64, output="complex", out=None, freqs=None,
+               band=None, sigma=5, Vc=None, precision=None):
+
+        SpectrogramDataは複素数をcomplex64で持つので, dtypeの既定はcomplex64(gwt.gwt()はcomplex).
+        結果をそのまま持ち, complex128で計算してから変換するコピーを作らない.
+
+        roi_ms=(stms, endms) を指定すると, その時間範囲だけを解析したSpectrogramDataを返す.
+        gwt().slice_time_ms(stms, endms) と同じ結果だが, 範囲外の列は計算しない.
+
+        time_resolution_ms を指定すると, その間隔の時刻だけを解析する(hop = time_resolution_ms[sample]).
+
+        output="amp", "db" のときは振幅/dBのみをfloat32で持つSpectrogramData(kind=output)を返す.
+
+        out=path(.npy)を指定すると, 結果をメモリマップのファイルに時間タイル毎に書き込み,
+        そのファイルを参照するSpectrogramDataを返す.
+        後でSpectrogramData.load_npy(path)で再計算せずに開ける.
+
+        freqs=[f, ...] または band=(f_lo, f_hi) を指定すると, その周波数だけを解析する.
+        SpectrogramDataの周波数軸(ydata)は解析した周波数になる.
+
+        method="iir" は再帰フィルタのガウス窓による実装(1ビンの計算量が周波数によらずO(N)).
+
+        precision="fast", "balanced", "exact" はカーネルの打ち切り(Vc)のプリセット.
+        打ち切りなしの畳み込みに対する最大dB誤差の上限と計算量はgwt.gwt(), gwt.gwt_cost()を参照.
+        """
+        from numpy import complex64
+
+        self._gwt_kw(kw)
+        kw.setdefault("dtype", complex64)
+        out = kw.get("out")
         data, times, freq = self._gwt(self.get_data(), self.get_fs(), *args, **kw)
-        return SpectrogramData(data, times, freq)._set_fs(self.get_fs())
+        specgram = SpectrogramData(data, times, freq, kind=kw.get("output", "complex"))
+        specgram._set_fs(self.get_fs())._set_hop(kw.get("hop", 1))._set_origin(self._gwt_origin(kw))
+        if isinstance(out, str):
+            specgram.save_npy(out)
+        return specgram
 
-    def stft(self, nwin=256, step=128):
+    @staticmethod
+    def _gwt_origin(kw):
+        """gwtの結果の0列目のサンプル番号(roiの開始位置)"""
+        roi = kw.get("roi")
+        return 0 if roi is None else roi[0]
+
+    def _gwt_kw(self, kw):
+        """roi_ms, time_resolution_ms をサンプル単位のroi, hopに変換"""
+        roi_ms = kw.pop("roi_ms", None)
+        if roi_ms is not None:
+            kw["roi"] = (self._ms2smp(roi_ms[0]), self._ms2smp(roi_ms[1]))
+        time_resolution_ms = kw.pop("time_resolution_ms", None)
+        if time_resolution_ms is not None:
+            kw["hop"] = max(1, self._ms2smp(time_resolution_ms))
+        return kw
+
+    @staticmethod
+    def gwt_batch(signals, *args, **kw):
+        """同じ長さ・同じfsのSignalDataのリストをgwt.gwt_batch()で解析し, SpectrogramDataのリストを返します.
+        カーネルバンクは1回だけ作り, 全クリップで使う(cache=Falseでも).
+        引数はgwt()と同じ(outは指定できない. dtypeの既定はcomplex64).
+
+            # >>> clips = [SignalData().load_wav(path).slice_time_ms(80, 120) for path in paths]
+            # >>> spgrams = SignalData.gwt_batch(clips, roi_ms=(20, 25))
+        """
+        from numpy import complex64
+        from .gwt import gwt_batch
+
+        if kw.get("out") is not None:
+            raise ValueError("gwt_batch does not accept out=")
+        fs = signals[0].get_fs()
+        if any(sig.get_fs() != fs for sig in signals):
+            raise ValueError("all signals must have the same fs")
+        lengths = set(sig.get_data().shape[0] for sig in signals)
+        if len(lengths) != 1:
+            raise ValueError("all signals must have the same length (%r)" % (sorted(lengths),))
+        signals[0]._gwt_kw(kw)
+        kw.setdefault("dtype", complex64)
+        data, times, freq = gwt_batch([sig.get_data() for sig in signals], fs, *args, stack=False, **kw)
+        kind = kw.get("output", "complex")
+        origin = signals[0]._gwt_origin(kw)
+        return [SpectrogramData(d, times, freq, kind=kind)._set_fs(fs)._set_hop(kw.get("hop", 1))._set_origin(origin)
+                for d in data]
+
+    def gwt_average(self, t_start_ms, t_end_ms, *args, **kw):
+        """gwt().slice_time_ms(t_start_ms, t_end_ms).time_average() と同じスペクトルを,
+        スペクトログラムを作らずに求めます.
+
+        周波数ブロック毎に時間窓内の出力だけを計算して振幅の平均を積算するので,
+        メモリは窓長×ブロック幅の作業領域と a_N 本の結果のみ.
+        その他の引数はgwt()と同じ(roi, roi_ms, output, outは指定できない. dtypeの既定はcomplex64).
+
+        :return: SpectrumData(時間平均振幅, 周波数軸)
+        """
+        from numpy import complex64
+
+        for name in ("roi", "roi_ms", "output", "out"):
+            if kw.get(name) is not None:
+                raise ValueError("gwt_average does not accept %s=" % (name,))
+        self._gwt_kw(kw)
+        kw.setdefault("dtype", complex64)
+        kw["roi"] = (self._ms2smp(t_start_ms), self._ms2smp(t_end_ms))
+        kw["output"] = "mean"
+        data, times, freq = self._gwt(self.get_data(), self.get_fs(), *args, **kw)
+        return SpectrumData(data=data[0], xdata=freq)
+
+    def gwt_adaptive(self, *args, **kw):
+        """gwt.gwt_adaptive()による粗→細の解析. パワーの大きい帯域だけ周波数軸を細かくした
+        SpectrogramData(周波数軸は不等間隔, get_yscale() == "nonuniform")を返します.
+
+            # >>> spgram = sig.gwt_adaptive(a_N=64, refine=8, threshold_db=-20)
+
+        引数はgwt_adaptive(audio_data, Fs, a_N=64, refine=8, threshold_db=-20., ...)のaudio_data, Fs以降.
+        roi_ms, time_resolution_ms, dtypeの既定(complex64)はgwt()と同じ.
+        """
+        from numpy import complex64
+        from .gwt import gwt_adaptive
+
+        self._gwt_kw(kw)
+        kw.setdefault("dtype", complex64)
+        data, times, freq = gwt_adaptive(self.get_data(), self.get_fs(), *args, **kw)
+        specgram = SpectrogramData(data, times, freq, kind=kw.get("output", "complex"))
+        return specgram._set_fs(self.get_fs())._set_hop(kw.get("hop", 1))._set_origin(self._gwt_origin(kw))
+
+    def stft(self, nwin=256, step=128, time_resolution_ms=None, output="complex", out=None, workers=1):
         """
         hammingwindowでstft
         x : 入力信号(モノラル)
         win : 窓関数
         step : シフト幅
+        time_resolution_ms : シフト幅[ms]. 指定するとstepより優先
+        output : "complex", "amp", "db". gwt()と同じ
+        out : 保存先の.npyファイル. 指定するとそのファイルのメモリマップに直接書き込み,
+              それを参照するSpectrogramDataを返す
+        workers : rfftのスレッド数(scipy.fftがあるとき)
         """
+        if time_resolution_ms is not None:
+            step = max(1, self._ms2smp(time_resolution_ms))
         x = self.get_data()
-        from scipy import hamming
+        from .spectral import get_window
 
-        win = hamming(nwin)
+        # 窓関数は長さ毎にキャッシュ
+        win = get_window("hamming", nwin)
 
-        from fisig2.core.stft import stft, frange
+        from .stft import stft, frange, _frame_count
 
         # FFT結果
-        # X<frame, freq>
-        X = stft(x, win, step)
-        X = X[:, :(nwin / 2)]
+        # X<frame, freq> 正の周波数(ナイキストを除く nwin // 2 列)のみ
+        shape = (_frame_count(x.size, nwin, step), nwin // 2)
+        if out is not None:
+            from numpy import complex64, float32
+            from numpy.lib.format import open_memmap
+
+            dtype = complex64 if output == "complex" else float32
+            X = open_memmap(out, mode="w+", dtype=dtype, shape=shape)
+        else:
+            X = None
+        X = stft(x, win, step, output, onesided=True, out=X, workers=workers)
+        if out is None:
+            X = X[:, :shape[1]]
         # 周波数軸
         freq = frange(nwin, self.get_fs())
-        freq = freq[:(nwin / 2)]
+        freq = freq[:shape[1]]
 
         # サイズ確認
         Nt, Nf = X.shape
@@ -132,8 +268,11 @@ class SignalData(BaseData):
 
         times = linspace(t0, t1, Nt)
 
-        specgram = SpectrogramData(data=X, xdata=times, ydata=freq)
+        specgram = SpectrogramData(data=X, xdata=times, ydata=freq, kind=output)
         specgram.set_fs(self.get_fs())
+        specgram._set_hop(step)
+        if out is not None:
+            specgram.save_npy(out)
 
         return specgram
 
@@ -177,34 +316,39 @@ class SignalData(BaseData):
         self._set_data(data)
         return self
 
-    def fft(self, window="hanning", nfft=None):
-        from numpy.fft.fftpack import fft as npfft
-        from numpy.fft import fftfreq as npfftfreq
-        from scipy import hamming, hanning
+    def fft(self, window="hanning", nfft=None, workers=1):
+        """
+        窓を掛けてFFT. 正の周波数(ナイキストを除く nfft // 2 点)のSpectrumDataを返す
+        window : "hamming", "hanning", "square"
+        nfft : FFT長. None(既定)は信号長, "fast"は信号長以上でFFTが速い長さ(next_fast_len)に0埋めする.
+               周波数軸は0埋め後の長さで計算する
+        workers : FFTのスレッド数(scipy.fftがあるとき)
+        """
+        from numpy import iscomplexobj
+        from .spectral import fft, fftfreq, get_window, next_fast_len, rfft
 
         sig = self.get_data()
         n = sig.shape[0]
 
-        if window == "hamming":
-            win = hamming(n)
-        elif window == "hanning":
-            win = hanning(n)
-        elif window == "square":
-            win = 1
-        else:
-            raise StandardError("Windows is not %s" % (window,))
+        # 窓関数は(種類, 長さ)毎にキャッシュ
+        win = get_window(window, n)
 
-        #: FFT, 折り返しこみ
         if nfft is None:
             nfft = n
+        elif nfft == "fast":
+            nfft = next_fast_len(n)
 
-        spec = npfft(sig * win, n=nfft)
+        #: FFT. 実信号はrfft(正の周波数のみ)
+        if iscomplexobj(sig):
+            spec = fft(sig * win, nfft, workers=workers)
+        else:
+            spec = rfft(sig * win, nfft, workers=workers)
 
         #: Freq, 折り返しこみ
-        freq = npfftfreq(nfft, d=1. / self.get_fs())
+        freq = fftfreq(nfft, self.get_fs())
 
         # : 折り返しを削除して返却
-        se = round(nfft / 2)
+        se = nfft // 2
         spectrum = SpectrumData(data=spec[:se], xdata=freq[:se], name=self.name)
         spectrum.set_fs(self.get_fs())
 
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""spectral.py
+SignalData.fft(), stft()が共有するFFTの下回り
+
+- 窓関数は (種類, 長さ, dtype) 毎にキャッシュし, 読み取り専用の配列を返す
+- FFT長は next_fast_len で速い長さに0埋めできる(周波数軸も同じ長さで計算する)
+- scipy.fft があればそれを使い, workers= でスレッド数を指定できる. なければ numpy.fft
+
+    # >>> from fisig2.spectral import get_window, next_fast_len, rfft, rfftfreq
+    # >>> n = next_fast_len(x.size)                       # 例えば 1931(素数) -> 1944
+    # >>> X = rfft(x * get_window("hanning", x.size), n, workers=4)
+    # >>> f = rfftfreq(n, fs)
+"""
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import scipy.fft as _fft
+except ImportError:
+    _fft = None
+
+# 窓関数の名前. 別名も受け付ける
+_WINDOWS = {
+    "hamming": np.hamming,
+    "hanning": np.hanning,
+    "hann": np.hanning,
+    "square": np.ones,
+    "boxcar": np.ones,
+}
+
+
+@lru_cache(maxsize=64)
+def _window(kind, n, dtype):
+    win = _WINDOWS[kind](n).astype(dtype)
+    win.flags.writeable = False
+    return win
+
+
+def get_window(kind, n, dtype=np.float64):
+    """窓関数(読み取り専用). 同じ (kind, n, dtype) には同じ配列を返す
+
+    :param kind: "hamming", "hanning"("hann"), "square"("boxcar")
+    :param n: 窓長
+    """
+    if kind not in _WINDOWS:
+        raise ValueError("Windows is not %s" % (kind,))
+    return _window(kind, int(n), np.dtype(dtype))
+
+
+def next_fast_len(n, real=True):
+    """n以上でFFTが速い長さ"""
+    if _fft is not None:
+        return _fft.next_fast_len(int(n), real)
+    return 1 << int(np.ceil(np.log2(n)))
+
+
+def _kw(workers):
+    if _fft is None or workers == 1:
+        return {}
+    # scipy.fftでは負の値が os.cpu_count() + 1 + workers
+    return {"workers": -1 if workers is None else workers}
+
+
+def fft(x, n=None, axis=-1, workers=1):
+    """複素FFT. workersはscipy.fftのスレッド数(Noneでos.cpu_count(), numpy.fftでは無視)"""
+    return (np.fft if _fft is None else _fft).fft(x, n, axis=axis, **_kw(workers))
+
+
+def rfft(x, n=None, axis=-1, workers=1):
+    """実数FFT(正の周波数 n // 2 + 1 点)"""
+    return (np.fft if _fft is None else _fft).rfft(x, n, axis=axis, **_kw(workers))
+
+
+def irfft(X, n=None, axis=-1, workers=1):
+    """rfftの逆変換"""
+    return (np.fft if _fft is None else _fft).irfft(X, n, axis=axis, **_kw(workers))
+
+
+def dct(x, type=2, workers=1):
+    """最後の軸のDCT(scipy.fft.dctと同じ定義, norm=None)
+    type=1: y[k] = x[0] + (-1)^k x[K] + 2 Σ_{n=1}^{K-1} x[n] cos(πkn / K) (長さK + 1)
+    type=2: y[k] = 2 Σ_n x[n] cos(πk(2n + 1) / 2K) (長さK)
+    numpy.fftのみのときはrfft, irfftで計算する(偶対称に折り返した配列は作らない)"""
+    if _fft is not None:
+        return _fft.dct(x, type, axis=-1, **_kw(workers))
+    if type == 1:
+        # 偶対称な長さ2Kの系列のfftは, 前半K + 1点のirfftと同じ形
+        n = 2 * (x.shape[-1] - 1)
+        return np.fft.irfft(x, n, axis=-1)[..., :n // 2 + 1] * n
+    elif type == 2:
+        # x[0], x[2], ..., x[3], x[1]と並べ替えた長さKのfft V から y[k] = 2 Re(exp(-iπk / 2K) V[k])
+        K = x.shape[-1]
+        v = np.concatenate((x[..., ::2], x[..., 1::2][..., ::-1]), axis=-1)
+        V = np.fft.rfft(v, axis=-1)
+        # rfftにないV[k] (k > K // 2)は共役 conj(V[K - k])
+        k = np.arange(K)
+        upper = k > K // 2
+        V = V[..., np.where(upper, K - k, k)]
+        V[..., upper] = np.conj(V[..., upper])
+        return 2 * np.real(V * np.exp(-1j * np.pi * k / (2. * K)))
+    raise ValueError("type is not %r" % (type,))
+
+
+def fftfreq(n, fs):
+    """長さnのFFTの周波数軸[Hz](折り返しこみ)"""
+    return np.fft.fftfreq(n, d=1. / fs)
+
+
+def rfftfreq(n, fs):
+    """長さnのrfftの周波数軸[Hz]"""
+    return np.fft.rfftfreq(n, d=1. / fs)
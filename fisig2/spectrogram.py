@@ -22,6 +22,16 @@
 from .core import *
 from .spectrum import SpectrumData
 
+# 時間方向に分けて処理するときのタイル[列]. メモリマップのデータも一度に読むのはこの分のみ.
+_TIME_TILE = 4096
+
+
+def _axes_path(path):
+    """save_npyで軸を保存するファイル名. data.npy -> data.axes.npz"""
+    import os
+
+    return os.path.splitext(path)[0] + ".axes.npz"
+
 
 class SpectrogramData(BaseData):
     """Spectrogramクラスは, 信号データを周波数分析した結果のクラスです.
@@ -29,6 +39,11 @@ class SpectrogramData(BaseData):
     主に信号データを解析した後に生成されるため, Spectrogramクラスを直接生成することはできません.
 
     :propaty data ndarray<time, frequency>:
+    :propaty kind: データの形式. "complex"(複素数), "amp"(振幅), "db"(20log10振幅).
+                   "amp", "db"はfloat32で持ち, get_data()もその値を返す.
+
+    dataがnp.memmapのときはコピーせずに参照するので, getterやtime_averageは触れた範囲だけを読む.
+    save_npy()で保存したものはload_npy()で再計算せずに開ける.
 
     使い方
     ----
@@ -48,16 +63,30 @@ class SpectrogramData(BaseData):
 
     """
 
-    def __init__(self, data, xdata, ydata):
+    def __init__(self, data, xdata, ydata, kind="complex"):
         super(SpectrogramData, self).__init__()
         # データの削減
         # complex128 = float64 x 2
         # complex64 = float32 x 2
-        from numpy import complex64
-        self._set_data(data.astype(complex64))
+        # gwt(dtype=complex64)の結果はそのまま(余分なコピーを作らない)
+        from numpy import complex64, float32, memmap
+        if kind not in ("complex", "amp", "db"):
+            raise ValueError("kind is not %r" % (kind,))
+        if isinstance(data, memmap):
+            # ファイル上のデータは読み込まずに参照する
+            self._data = data
+        elif kind == "complex":
+            self._set_data(data.astype(complex64, copy=False))
+        else:
+            self._set_data(data.astype(float32, copy=False))
+        self._kind = kind
 
         self._set_xdata(xdata)
         self._set_ydata(ydata)
+        # 時間軸の1列あたりのサンプル数(stftのstep, gwtのhop)
+        self._hop = 1
+        # 0列目の信号上のサンプル番号(gwt(roi_ms=...)の開始位置). slice_time_msの時刻は信号の先頭から数える
+        self._origin = 0
         self.slc()
 
     def info(self):
@@ -69,27 +98,154 @@ class SpectrogramData(BaseData):
         print("#: ------------------------------- :#\n")
         return self
 
+    #: ----------------------------------------------------
+    #: 物理量
+    #: ----------------------------------------------------
+    def get_kind(self):
+        return self._kind
+
+    def _amp(self, data):
+        """データの一部から振幅を計算する(dataは書き換えない). kind="amp", "db"のときはabsを計算しない"""
+        from numpy import abs, array, clip
+
+        if self._kind == "complex":
+            amp = abs(data)
+        elif self._kind == "db":
+            amp = 10 ** (data / 20.)
+        else:
+            amp = array(data)
+        # 最小値は20*log10(1e-8)=-160
+        clip(amp, a_min=1e-8, a_max=1e32, out=amp)
+        return amp
+
+    def get_logpow(self):
+        if self._kind == "db":
+            return self._memoized("logpow", self.get_data)
+        return super(SpectrogramData, self).get_logpow()
+
     #: ----------------------------------------------------
     #: Average
     #: ----------------------------------------------------
     def time_average(self):
-        from numpy import mean
+        from numpy import zeros
 
-        data = mean(self.get_amp(), axis=0)
+        # 時間方向のタイル毎に積算する
+        ss, se = self._x_ss, self._x_es
+        data = zeros(self._y_es - self._y_ss)
+        for s in range(ss, se, _TIME_TILE):
+            data += self._amp(self._data[s:min(se, s + _TIME_TILE), self._y_ss:self._y_es]).sum(axis=0)
+        data /= se - ss
         freq = self.get_ydata()
         return SpectrumData(data=data, xdata=freq)
 
+    #: ----------------------------------------------------
+    #: Analys
+    #: ----------------------------------------------------
+    def liftering(self, lifter, mode, workers=1):
+        """全フレームのスペクトルをまとめてリフタリングします(ceps.liftering).
+        振幅(kind="amp")のSpectrogramDataを返す. 時間方向のタイル毎に処理するのでメモリマップも一度に読まない."""
+        from numpy import empty, float32
+        from .ceps import liftering
+
+        ss, se = self._x_ss, self._x_es
+        data = empty((se - ss, self._y_es - self._y_ss), dtype=float32)
+        for s in range(ss, se, _TIME_TILE):
+            e = min(se, s + _TIME_TILE)
+            data[s - ss:e - ss] = liftering(self._amp(self._data[s:e, self._y_ss:self._y_es]), lifter, mode, workers)
+        specgram = SpectrogramData(data, self.get_xdata(), self.get_ydata(), kind="amp")
+        return specgram._set_fs(self.get_fs())._set_hop(self._hop)._set_origin(self._origin + ss * self._hop)
+
+    #: ----------------------------------------------------
+    #: 保存
+    #: ----------------------------------------------------
+    def save_npy(self, path):
+        """データ全体を.npyファイルに, 時間軸・周波数軸・fs・hop・origin・kindを<path>.axes.npzに保存します.
+        データがpathのメモリマップのとき(SignalData.gwt(out=path))は軸のみを書き込みます.
+        """
+        import os
+        from numpy import memmap, nan, save, savez
+
+        data = self._data
+        if isinstance(data, memmap) and data.filename and os.path.abspath(data.filename) == os.path.abspath(path):
+            data.flush()
+        else:
+            with open(path, "wb") as f:
+                save(f, data)
+        fs = nan if self._fs is None else self._fs
+        savez(_axes_path(path), xdata=self._xdata, ydata=self._ydata, fs=fs, hop=self._hop, origin=self._origin,
+              kind=self._kind)
+        return self
+
+    @classmethod
+    def load_npy(cls, path, mode="r"):
+        """save_npy()で保存したスペクトログラムをメモリマップで開きます(再計算しない).
+        :param mode: np.loadのmmap_mode. "r"読み込みのみ, "r+"書き換え可
+        """
+        from numpy import load
+
+        data = load(path, mmap_mode=mode)
+        with load(_axes_path(path)) as axes:
+            specgram = cls(data, axes["xdata"], axes["ydata"], kind=str(axes["kind"]))
+            specgram._set_fs(float(axes["fs"]))
+            specgram._set_hop(int(axes["hop"]))
+            # originのない古いファイルは先頭から
+            specgram._set_origin(int(axes["origin"]) if "origin" in axes.files else 0)
+        return specgram
+
     #: ----------------------------------------------------
     #: 補助
     #: ----------------------------------------------------
+    def get_yscale(self):
+        """周波数軸の間隔. "linear"(等間隔), "log"(対数等間隔), "nonuniform"のいずれか"""
+        from numpy import allclose, diff
+
+        freq = self._ydata
+        if freq.size < 3:
+            return "linear"
+        df = diff(freq)
+        if allclose(df, df[0]):
+            return "linear"
+        if freq[0] > 0 and allclose(freq[1:] / freq[:-1], freq[1] / freq[0]):
+            return "log"
+        return "nonuniform"
+
+    def _ms2smp(self, ms):
+        """時間[ms](信号の先頭から)を列番号に変換. 0列目はoriginサンプル目"""
+        return int((ms / 1000. * self._fs - self._origin) / self._hop)
+
+    def _smp2ms(self, smp):
+        return (float(smp) * self._hop + self._origin) / float(self._fs) * 1000.
+
+    def get_hop(self):
+        return self._hop
+
+    def _set_hop(self, hop):
+        self._hop = hop
+        return self
+
+    def get_origin(self):
+        return self._origin
+
+    def _set_origin(self, origin):
+        self._origin = origin
+        return self
+
     def slice_time_ms(self, stms, endms):
         ss = self._ms2smp(stms)
         se = self._ms2smp(endms)
-        self._slice_xdata(ss, se)
-        return self
+        return self.slice_time_smp(ss, se)
 
     def slice_time_smp(self, start, end):
-        self._slice_xdata(start, end)
+        """列番号[start, end)でスライスします.
+
+        範囲は計算した列[0, 列数)に切り詰めます(端の丸め誤差ではみ出しても良い).
+        切り詰めて空になる(計算した範囲と重ならない)ときは0の平均などを返さないように例外
+        """
+        n = self._xdata.shape[0]
+        ss, se = max(int(start), 0), min(int(end), n)
+        if not ss < se:
+            raise ValueError("time slice %r-%r does not overlap 0-%r" % (start, end, n))
+        self._slice_xdata(ss, se)
         return self
 
     #: ----------------------------------------------------
@@ -98,12 +254,18 @@ class SpectrogramData(BaseData):
     def plot(self):
         import matplotlib.pyplot as plt
 
-        # extent = self.get_xdata()[0], self.get_xdata()[-1], self.get_ydata()[0], self.get_ydata()[-1]
-        extent = self.get_xdata()[0] * 1000, self.get_xdata()[-1] * 1000, self.get_ydata()[0] / 1000, self.get_ydata()[
-            -1] / 1000
+        freq = self.get_ydata()
+        if self.get_yscale() == "linear":
+            # extent = self.get_xdata()[0], self.get_xdata()[-1], self.get_ydata()[0], self.get_ydata()[-1]
+            extent = self.get_xdata()[0] * 1000, self.get_xdata()[-1] * 1000, freq[0] / 1000, freq[-1] / 1000
 
-        plt.imshow(self.get_logpow().T, origin="lower", aspect="auto", cmap="jet", extent=extent)
-        # plt.imshow(self.get_data(), origin = "lower", aspect = "auto", cmap = "hot", vmin = vmin, vmax = vmax)
+            plt.imshow(self.get_logpow().T, origin="lower", aspect="auto", cmap="jet", extent=extent)
+            # plt.imshow(self.get_data(), origin = "lower", aspect = "auto", cmap = "hot", vmin = vmin, vmax = vmax)
+        else:
+            # 不等間隔の周波数軸はビン毎に描画
+            plt.pcolormesh(self.get_xdata() * 1000, freq / 1000, self.get_logpow().T, cmap="jet", shading="nearest")
+            if self.get_yscale() == "log":
+                plt.yscale("log")
 
         plt.xlabel('Time [ms]')
         plt.ylabel('Frequency [kHz]')
@@ -102,6 +102,17 @@ class SpectrumData(BaseData):
 
         return SpectrumData(data, xdata)
 
+    def liftering_many(self, lifters, workers=1):
+        """ケプストラムを一度だけ計算して, 複数のリフタでリフタリングします(ceps.liftering_many).
+            # >>> g, katasa, high = spec.liftering_many([(5, "low"), (15, "low"), (13, "high")])
+        :param lifters: (lifter, mode)のリスト. modeは'low', 'high'
+        :return: lifters毎のSpectrumDataのリスト
+        """
+        datas = liftering_many(self.get_amp(), lifters, workers)
+        xdata = self.get_xdata()
+
+        return [SpectrumData(data, xdata) for data in datas]
+
     def lfiltering(self, b=None, a=None):
         from scipy.signal import lfilter
 
@@ -149,7 +160,7 @@ class SpectrumData(BaseData):
 
     def ma(self, tap=3):
 
-        data = self.get_amp()
+        data = self.get_amp().copy()
         data[0] = 0
 
         from numpy import convolve
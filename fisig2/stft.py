@@ -6,10 +6,20 @@
 # ==================================
 # from scipy.fftpack import fft
 # from scipy.fftpack import fftfreq
-from scipy import ifft  # こっちじゃないとエラー出るときあった気がする
 from numpy.fft import fftfreq
-from numpy.fft import fft as npfft
-from scipy import ceil, complex64, float64, hamming, zeros
+from functools import lru_cache
+
+from numpy import arange, ceil, complex64, float32, float64, hamming, zeros
+
+try:
+    from .spectral import irfft, rfft
+except ImportError:
+    from spectral import irfft, rfft
+
+# 一度にrfftするフレーム数(作業領域の上限)
+_FRAME_TILE = 4096
+# istftで複数をまとめてirfft, overlap-addするフレーム数. キャッシュに収まる程度が最も速かった
+_OLA_TILE = 1024
 
 
 # ======
@@ -21,51 +31,282 @@ def frange(N, fs):
     return fftfreq(N, d=1./fs) # scipy
 
 
+def _frame_count(l, N, step):
+    """長さlの信号をstft(窓幅N, シフト幅step)したときの時間フレーム数(従来の式)"""
+    return int(ceil(float(l - N + step) / step)) + N - 1
+
+
 # ======
 #  STFT
 # ======
-"""
-x : 入力信号(モノラル)
-win : 窓関数
-step : シフト幅
-"""
-def stft(x, win, step):
+def _out_dtype(output):
+    if output == "complex":
+        return complex64 # スペクトログラムの型(複素数型)
+    elif output in ("amp", "db"):
+        return float32 # 振幅のみ
+    raise ValueError("output is not %r" % (output,))
+
+
+def _spectra(frames, win, output, out, workers=1):
+    """frames<M, N>を窓掛けしてrfftし, 形式outputでout<M, k>の先頭k列に書き込む"""
+    from numpy import abs, conj, log10, maximum
+    M, N = frames.shape
+    k = out.shape[1]
+    # 両側のときは rfft で計算した片側 n1 列の残りを共役で埋める
+    n1 = min(k, N // 2 + 1)
+    for s in range(0, M, _FRAME_TILE):
+        e = min(M, s + _FRAME_TILE)
+        Y = rfft(frames[s:e] * win, axis = 1, workers = workers)
+        if output == "complex":
+            out[s:e, :n1] = Y[:, :n1]
+            if k > n1:
+                # X[N - j] = conj(X[j])
+                out[s:e, n1:k] = conj(Y[:, N - n1:N - k:-1])
+        else:
+            A = abs(Y)
+            out[s:e, :n1] = A[:, :n1]
+            if k > n1:
+                out[s:e, n1:k] = A[:, N - n1:N - k:-1]
+            if output == "db":
+                # 書き込んだタイルがキャッシュにあるうちにdBにする(outをもう一度走査しない)
+                # 振幅の下限はBaseData.get_ampと同じ1e-8
+                D = out[s:e, :k]
+                maximum(D, 1e-8, out = D)
+                log10(D, out = D)
+                D *= 20
+    return out
+
+
+def stft(x, win, step, output="complex", onesided=False, out=None, workers=1):
+    """
+    x : 入力信号(モノラル)
+    win : 窓関数
+    step : シフト幅
+    output : "complex" 複素数, "amp" 振幅, "db" 20log10振幅 (float32)
+    onesided : Trueのとき周波数軸は0からナイキストまでのN // 2 + 1列(rfftの結果そのまま).
+               False(既定)のときは従来通り両側のN列(負の周波数は共役で埋める)
+    out : 出力先<M, k>. 各フレームの先頭k列を書き込む(SignalData.stftのメモリマップ等)
+    workers : rfftのスレッド数(scipy.fftがあるとき. spectral.py)
+    """
     from numpy import asarray
+    from numpy.lib.stride_tricks import sliding_window_view
     x = asarray(x)
-    win = asarray(win)
+    win = asarray(win, dtype = float64)
     l = x.size # 入力信号の長さ
     N = win.size # 窓幅、つまり切り出す幅
-    M = int(ceil(float(l - N + step) / step))+N-1 # スペクトログラムの時間フレーム数
+    M = _frame_count(l, N, step) # スペクトログラムの時間フレーム数
 
     new_x = zeros(N + ((M - 1) * step), dtype = float64)
     new_x[: l] = x # 信号をいい感じの長さにする
+    # フレーム<M, N>はnew_xのビュー(コピーしない)
+    frames = sliding_window_view(new_x, N)[::step]
 
-    X = zeros([M, N], dtype = complex64) # スペクトログラムの初期化(複素数型)
-    for m in xrange(M):
-        start = step * m
-        X[m, :] = npfft(new_x[start : start + N] * win)
-    return X
+    dtype = _out_dtype(output)
+    width = N // 2 + 1 if onesided else N
+    if out is None:
+        out = zeros([M, width], dtype = dtype)
+    else:
+        assert out.shape[0] == M and out.shape[1] <= width, "out.shape:%r, expected:<%r, <=%r>" % (out.shape, M, width)
+    return _spectra(frames, win, output, out, workers)
 
 # =======
 #  iSTFT
 # =======
-def istft(X, win, step):
-    M, N = X.shape
-    assert (len(win) == N), "FFT length and window length are different."
-
-    l = (M - 1) * step + N
-    x = zeros(l, dtype = float64)
-    wsum = zeros(l, dtype = float64)
-    for m in xrange(M):
-        start = step * m
+@lru_cache(maxsize=32)
+def _window_sum(win, step, M):
+    """overlap-addの正規化 Σ win ** 2 (0の所は1にして割っても値が変わらないようにする).
+    win(bytes), step, フレーム数M毎にキャッシュする. 書き換え不可の配列を返す.
+    """
+    from numpy import frombuffer, ones
+
+    win = frombuffer(win, dtype = float64)
+    wsum = _overlap_add(ones((M, 1)) * win ** 2, step)
+    wsum[wsum == 0] = 1
+    wsum.flags.writeable = False
+    return wsum
+
+
+def _overlap_add(frames, step):
+    """frames<..., M, N>をstep毎にずらして足し合わせる <..., (M - 1) * step + N>.
+    各フレームをstep幅の区間に分け, 同じ位置の区間をまとめて足す(区間数 ceil(N / step) 回の加算のみ).
+    """
+    M, N = frames.shape[-2:]
+    R = -(-N // step)
+    y = zeros(frames.shape[:-2] + ((M + R) * step,), dtype = frames.dtype)
+    for r in range(R):
+        w = min(step, N - r * step)
+        # y[r * step + m * step + j] += frames[m, r * step + j]
+        y[..., r * step:(r + M) * step].reshape(frames.shape[:-2] + (M, step))[..., :w] += frames[..., r * step:r * step + w]
+    return y[..., :(M - 1) * step + N]
+
+
+def _synthesize(X, win, workers=1):
+    """スペクトルX<..., M, K>(K = Nは両側, N // 2 + 1は片側)を逆変換して窓を掛けたフレーム<..., M, N>"""
+    from numpy import conj
+    N = win.size
+    n1 = N // 2 + 1
+    assert (X.shape[-1] in (N, n1)), "FFT length and window length are different."
+    if X.shape[-1] == N:
+        # ifft(X).real は X のエルミート部分 (X[k] + conj(X[-k])) / 2 のirfftに等しい
+        X = (X[..., :n1] + conj(X[..., -arange(n1) % N])) / 2
+    return irfft(X, n = N, axis = -1, workers = workers) * win
+
+
+def istft(X, win, step, workers=1):
+    """
+    X : stft()の結果<M, N>(両側)または<M, N // 2 + 1>(onesided=True). <..., M, *>で複数をまとめて処理する
+    win : 窓関数(長さN)
+    step : シフト幅
+    workers : irfftのスレッド数(stft()と同じ)
+    """
+    from numpy import asarray
+    X = asarray(X)
+    win = asarray(win, dtype = float64)
+    M, K = X.shape[-2:]
+    wsum = _window_sum(win.tobytes(), step, M)
+
+    # 複数のときは合計_OLA_TILEフレーム程度ずつ処理する
+    Xs = X.reshape((-1, M, K))
+    x = zeros((Xs.shape[0], wsum.size), dtype = float64)
+    tile = max(1, _OLA_TILE // M)
+    for s in range(0, Xs.shape[0], tile):
         ### 滑らかな接続
-        x[start : start + N] = x[start : start + N] + ifft(X[m, :]).real * win
-        wsum[start : start + N] += win ** 2
-    pos = (wsum != 0)
-    x_pre = x.copy()
+        x[s:s + tile] = _overlap_add(_synthesize(Xs[s:s + tile], win, workers), step)
     ### 窓分のスケール合わせ
-    x[pos] /= wsum[pos]
-    return x
+    x /= wsum
+    return x.reshape(X.shape[:-2] + (wsum.size,))
+
+
+# ===========
+#  Streaming
+# ===========
+class StftStream(object):
+    """チャンク毎に入力し, 揃ったフレームから返すstft
+
+    次のフレームの先頭以降の入力(N - step サンプル未満)のみを保持するので, 入力の長さによらずメモリは一定.
+    process()の結果とflush()の結果を連結したものは stft(全信号, win, step, output, onesided) と一致する.
+
+        # >>> stream = StftStream(hamming(256), 128)
+        # >>> for chunk in chunks:
+        # ...     frames = stream.process(chunk)   # <揃ったフレーム数, 256>
+        # >>> frames = stream.flush()              # 信号の後ろを0として残りのフレーム
+
+    :param output, onesided: stft()と同じ
+    """
+
+    def __init__(self, win, step, output="complex", onesided=False):
+        from numpy import asarray
+        self.win = asarray(win, dtype = float64)
+        self.step = int(step)
+        self.output = output
+        self.width = self.win.size // 2 + 1 if onesided else self.win.size
+        self._dtype = _out_dtype(output)
+        # _bufの先頭が次のフレームの先頭. step > Nのときはフレーム間の読み飛ばす数を_skipに持つ
+        self._buf = zeros(0, dtype = float64)
+        self._skip = 0
+        self.received = 0
+        self.frames = 0
+
+    def process(self, chunk):
+        """chunkを追加し, 新しく揃ったフレーム<k, width>を返す(kは0のこともある)."""
+        from numpy import asarray, concatenate
+        chunk = asarray(chunk, dtype = float64).ravel()
+        self.received += chunk.size
+        skip = min(self._skip, chunk.size)
+        self._skip -= skip
+        self._buf = concatenate((self._buf, chunk[skip:]))
+        N = self.win.size
+        k = (self._buf.size - N) // self.step + 1 if self._buf.size >= N else 0
+        return self._emit(self._buf, k)
+
+    def flush(self):
+        """信号の終わりとして, 0埋めした残りのフレーム(stft()と同じフレーム数まで)を返す."""
+        N, step = self.win.size, self.step
+        k = _frame_count(self.received, N, step) - self.frames
+        buf = zeros(N + (k - 1) * step, dtype = float64)
+        buf[:self._buf.size] = self._buf[:buf.size]
+        return self._emit(buf, k)
+
+    def _emit(self, buf, k):
+        from numpy.lib.stride_tricks import sliding_window_view
+        out = zeros([k, self.width], dtype = self._dtype)
+        if k > 0:
+            _spectra(sliding_window_view(buf, self.win.size)[::self.step][:k], self.win, self.output, out)
+            # 次のフレームの先頭から残す
+            used = k * self.step
+            self._skip = max(0, used - buf.size)
+            self._buf = buf[used:].copy()
+            self.frames += k
+        return out
+
+
+class IstftStream(object):
+    """フレームが届く毎にoverlap-addし, 以降のフレームが重ならない(確定した)サンプルを返すistft
+
+    保持するのは最後のフレームと重なるNサンプル分のみ.
+    process()の結果とflush()の結果を連結したものは istft(全フレーム, win, step) と一致する.
+
+        # >>> stream = IstftStream(hamming(256), 128)
+        # >>> for frames in spectrogram_chunks:
+        # ...     samples = stream.process(frames)
+        # >>> samples = stream.flush()
+    """
+
+    def __init__(self, win, step):
+        from numpy import asarray
+        self.win = asarray(win, dtype = float64)
+        self.step = int(step)
+        # _x, _wは出力済みのサンプル数posから始まる, 窓掛けした信号と窓の2乗の和
+        self._x = zeros(0, dtype = float64)
+        self._w = zeros(0, dtype = float64)
+        self.pos = 0
+        self.frames = 0
+
+    def process(self, X):
+        """フレームX<k, K>を追加し, 確定したサンプルを返す."""
+        from numpy import asarray, atleast_2d
+        X = atleast_2d(asarray(X))
+        k = X.shape[0]
+        if k == 0:
+            return zeros(0, dtype = float64)
+        N, step = self.win.size, self.step
+        y = _overlap_add(_synthesize(X, self.win), step)
+        w = _overlap_add(zeros((k, 1)) + self.win ** 2, step)
+        # 追加するフレームの先頭のサンプル番号から, バッファ上の位置へ
+        s = self.frames * step - self.pos
+        end = s + y.size
+        if end > self._x.size:
+            self._x = _extend(self._x, end)
+            self._w = _extend(self._w, end)
+        self._x[s:end] += y
+        self._w[s:end] += w
+        self.frames += k
+        # 次のフレームの先頭 frames * step より前は確定(step > N のときは最後のフレームの終わりまで)
+        return self._emit((self.frames - 1) * step + min(step, N) - self.pos)
+
+    def flush(self):
+        """残りのサンプルを返す."""
+        if self.frames == 0:
+            return zeros(0, dtype = float64)
+        return self._emit((self.frames - 1) * self.step + self.win.size - self.pos)
+
+    def _emit(self, n):
+        x = self._x[:n].copy()
+        w = self._w[:n]
+        ### 窓分のスケール合わせ
+        pos = (w != 0)
+        x[pos] /= w[pos]
+        self._x = self._x[n:]
+        self._w = self._w[n:]
+        self.pos += n
+        return x
+
+
+def _extend(a, n):
+    """aの後ろを0で埋めて長さnにする"""
+    b = zeros(n, dtype = a.dtype)
+    b[:a.size] = a
+    return b
 
 
 if __name__ == "__main__":
@@ -78,7 +319,7 @@ if __name__ == "__main__":
 
     fftLen = 512 # とりあえず
     win = hamming(fftLen) # ハミング窓
-    step = fftLen / 4
+    step = fftLen // 4
 
     ### STFT
     spectrogram = stft(data, win, step)
@@ -93,7 +334,7 @@ if __name__ == "__main__":
     pl.xlim([0, len(data)])
     pl.title("Input signal", fontsize = 20)
     fig.add_subplot(312)
-    pl.imshow(abs(spectrogram[:, : fftLen / 2 + 1].T), aspect = "auto", origin = "lower")
+    pl.imshow(abs(spectrogram[:, : fftLen // 2 + 1].T), aspect = "auto", origin = "lower")
     pl.title("Spectrogram", fontsize = 20)
     fig.add_subplot(313)
     pl.plot(resyn_data)
@@ -0,0 +1,47 @@
+#! coding:utf-8
+"""
+bench_features.py
+
+特徴量抽出の連鎖(cof, ave_power, band_power, get_pow_norm, get_logpow_norm)の計測.
+BaseDataの派生量(amp, pow, logpow, pow_norm)の保持あり(memoize=True)となし(False)を比較する.
+audio.wavの40[ms], 400[ms]のクリップ200本のスペクトル(SignalData.fft())を使う.
+"""
+import time
+
+import numpy as np
+
+from fisig2.core import BaseData
+from fisig2.signaldata import SignalData
+
+wavfilepaht = "./audio.wav"
+
+
+def features(spec):
+    return [spec.cof("log"), spec.cof("lin"), spec.ave_power("lin"), spec.ave_power("log"),
+            spec.band_power(100, 1000), spec.band_power(1000, 4500), spec.band_power(4500, 20000),
+            spec.get_pow_norm().max(), spec.get_logpow_norm().max()]
+
+
+if __name__ == '__main__':
+    sig = SignalData().load_wav(wavfilepaht, "M")
+    for ms in (40, 400):
+        n = int(ms / 1000. * sig.get_fs())
+        starts = np.random.RandomState(0).randint(0, sig._data.size - n, 200)
+        specs = [sig.slc().slice_time_smp(s, s + n).fft() for s in starts]
+        sig.slc()
+
+        result = {}
+        for memoize in (False, True):
+            BaseData.memoize = memoize
+            best = None
+            for _ in range(5):
+                for spec in specs:
+                    spec._memo_clear()
+                start = time.time()
+                result[memoize] = [features(spec) for spec in specs]
+                dt = time.time() - start
+                best = dt if best is None else min(best, dt)
+            print("%d[ms] memoize=%-5r %8.2f[ms] (%d spectra, %d bins)"
+                  % (ms, memoize, best * 1000, len(specs), specs[0].get_data().size))
+        BaseData.memoize = True
+        print("  max |diff| %.1e" % np.abs(np.array(result[True]) - np.array(result[False])).max())
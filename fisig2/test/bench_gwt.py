@@ -0,0 +1,155 @@
+#! coding:utf-8
+"""
+bench_gwt.py
+
+gwt(workers=n)のスケーリング計測.
+golfanalysis1.pyと同じ80-120[ms]区間を a_N=512 で解析する.
+対数周波数軸(50[Hz]-20[kHz])の多重レート計算, hop(時間間引き出力)の効果も計測する.
+dtype=complex64の速度と, float64を基準とした精度(ピーク比の最大誤差, dB誤差)も表示する.
+precision=のプリセット毎のカーネル長, 計算量(gwt_cost), 時間, 打ち切りなしの参照に対する最大dB誤差も表示する.
+method="iir"(再帰フィルタ)とFFTエンジンの時間・ピークメモリを, 長い信号の低域で比較する.
+GwtStream.push()の1回あたりの時間を, 伸びるバッファにgwt()をかけ直す場合と比較する.
+gwt_adaptive(a_N=64, refine=8)と密な軸(a_N=512)の時間とビン数も比較する.
+最後に, 同じ長さの120クリップのgwt_batch()とクリップ毎のループを比較する.
+"""
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from fisig2.gwt import _psi, gwt, gwt_adaptive, gwt_batch, gwt_cost, GwtStream
+
+wavfilepaht = "./audio.wav"
+
+
+def bench(x, fs, workers, repeat=5, **kw):
+    # カーネルバンクはキャッシュ済みの状態で計測
+    gwt(x, fs, workers=workers, **kw)
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        gwt(x, fs, workers=workers, **kw)
+        dt = time.time() - start
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+if __name__ == '__main__':
+    from scipy.io import wavfile
+
+    fs, data = wavfile.read(wavfilepaht)
+    data = np.mean(data, axis=1) / 32768.
+    # 長めの区間でも計測
+    for ms in (40, 400):
+        x = data[int(0.080 * fs):int(0.080 * fs) + int(ms / 1000. * fs)]
+        print("N=%d (%d[ms]), a_N=512" % (x.size, ms))
+        t1 = bench(x, fs, 1)
+        for workers in (1, 2, 4, 8, 16, 32):
+            if workers > (os.cpu_count() or 1):
+                break
+            dt = bench(x, fs, workers)
+            print("  workers=%-3d %8.2f[ms]  x%.2f" % (workers, dt * 1000, t1 / dt))
+
+        # 対数周波数軸: 全レート / オクターブ毎の間引き
+        log = dict(f_min=50, f_max=20000, scale="log")
+        t_full = bench(x, fs, 1, multirate=False, **log)
+        t_multi = bench(x, fs, 1, multirate=True, **log)
+        print("  log full-rate %8.2f[ms], multirate %8.2f[ms]  x%.2f" % (t_full * 1000, t_multi * 1000, t_full / t_multi))
+
+        # 時間間引き出力: 1[ms], 10[ms]毎
+        for hop_ms in (1, 10):
+            hop = int(hop_ms / 1000. * fs)
+            t_hop = bench(x, fs, 1, hop=hop)
+            print("  hop=%-4d(%d[ms]) %8.2f[ms]  x%.2f" % (hop, hop_ms, t_hop * 1000, t1 / t_hop))
+
+        # 単精度: 速度と精度
+        A = gwt(x, fs)[0]
+        B = gwt(x, fs, dtype=np.complex64)[0]
+        t_single = bench(x, fs, 1, dtype=np.complex64)
+        peak = np.abs(A).max()
+        dba = 20 * np.log10(np.abs(A) / peak + 1e-300)
+        dbb = 20 * np.log10(np.abs(B) / peak + 1e-300)
+        print("  complex64 %8.2f[ms]  x%.2f  max|err|/peak=%.1e" % (t_single * 1000, t1 / t_single, np.abs(A - B).max() / peak))
+        for floor in (-60, -100):
+            mask = dba > floor
+            print("    max dB error (bins > %d[dB]) %.1e" % (floor, np.abs(dba - dbb)[mask].max()))
+
+    # 精度プリセット: 40[ms], a_N=64. 参照は打ち切りなしの畳み込み
+    x = data[int(0.080 * fs):int(0.120 * fs)]
+    N = x.size
+    d = np.arange(-(N - 1), N) / float(fs)
+    fn = gwt(x, fs, a_N=64)[2]
+    R = np.array([np.convolve(x, _psi(1. / f, 0., d, 5) * np.sqrt(f))[N - 1:2 * N - 1] for f in fn]).T
+    mask = np.abs(R) > np.abs(R).max() * 10 ** (-40 / 20.)
+    print("precision (N=%d, a_N=64)" % N)
+    for precision in (None, "fast", "balanced", "exact"):
+        A = gwt(x, fs, a_N=64, precision=precision)[0]
+        cost = gwt_cost(N, fs, a_N=64, precision=precision)
+        dt = bench(x, fs, 1, a_N=64, precision=precision)
+        err = np.abs(20 * np.log10(np.abs(A[mask]) / np.abs(R[mask]))).max()
+        print("  %-8s max taps %5d, mean taps %7.1f, %.2e flops %8.2f[ms]  max dB error (> -40[dB]) %.3f"
+              % (precision, cost["max_taps"], cost["mean_taps"], cost["flops"], dt * 1000, err))
+
+    # 粗→細: 400[ms]区間, 64本から8倍
+    x = data[int(0.080 * fs):int(0.480 * fs)]
+    t_dense = bench(x, fs, 1, a_N=512)
+    print("adaptive (N=%d): dense a_N=512 %8.2f[ms]" % (x.size, t_dense * 1000))
+    for threshold_db in (-10, -20, -30):
+        gwt_adaptive(x, fs, threshold_db=threshold_db)
+        start = time.time()
+        fn = gwt_adaptive(x, fs, threshold_db=threshold_db)[2]
+        dt = time.time() - start
+        print("  threshold %d[dB]: %3d bins %8.2f[ms]  x%.2f" % (threshold_db, fn.size, dt * 1000, t_dense / dt))
+
+    # 再帰フィルタ: 10[s]の雑音, 20-500[Hz]の対数軸32本(低域のカーネルが長い)
+    noise = np.random.RandomState(0).randn(int(10 * fs))
+    low = dict(a_N=32, scale="log", f_min=20, f_max=500, output="db", cache=False)
+    print("iir (N=%d, 20-500[Hz], a_N=32)" % noise.size)
+    for kw in (dict(method="fft", multirate=False), dict(method="fft", precision="exact"),
+               dict(method="fft", multirate=True), dict(method="iir")):
+        start = time.time()
+        gwt(noise, fs, **dict(low, **kw))
+        dt = time.time() - start
+        tracemalloc.start()
+        gwt(noise, fs, **dict(low, **kw))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("  %-45r %8.2f[s]  peak %6.0f[MiB]" % (kw, dt, peak / 2. ** 20))
+
+    # 逐次計算: 5[s]の雑音を10[ms], 100[ms]毎にpush. a_N=128, 8[kHz]まで
+    live = dict(a_N=128, f_max=8000, output="db")
+    for chunk_ms in (10, 100):
+        chunk = int(chunk_ms / 1000. * fs)
+        stream = GwtStream(fs, **live)
+        times = []
+        for c in range(0, noise.size // 2, chunk):
+            start = time.time()
+            stream.push(noise[c:c + chunk])
+            times.append(time.time() - start)
+        print("GwtStream push %d[ms]: mean %.2f[ms], max %.2f[ms] (H=%d, buffer %d samples)"
+              % (chunk_ms, np.mean(times[10:]) * 1000, np.max(times[10:]) * 1000, stream.H, stream._buf.size))
+    for sec in (1, 5):
+        start = time.time()
+        gwt(noise[:int(sec * fs)], fs, **live)
+        print("  gwt() on the whole %d[s] buffer %.2f[s]" % (sec, time.time() - start))
+
+    # 一括計算: 40[ms]のクリップ120本. カーネルバンクは1回だけ作る
+    n = int(0.040 * fs)
+    starts = np.random.RandomState(0).randint(0, data.size - n, 120)
+    clips = np.array([data[s:s + n] for s in starts])
+    for kw in (dict(a_N=512), dict(a_N=128), dict(a_N=512, dtype=np.complex64, output="db")):
+        gwt(clips[0], fs, **kw)
+        start = time.time()
+        for c in clips:
+            gwt(c, fs, **kw)
+        t_loop = time.time() - start
+        start = time.time()
+        for c in clips:
+            gwt(c, fs, cache=False, **kw)
+        t_nocache = time.time() - start
+        start = time.time()
+        gwt_batch(clips, fs, cache=False, **kw)
+        t_batch = time.time() - start
+        print("clips=%d %r: loop %.2f[s], loop(cache=False) %.2f[s], gwt_batch(cache=False) %.2f[s]  x%.2f / x%.2f"
+              % (len(clips), kw, t_loop, t_nocache, t_batch, t_loop / t_batch, t_nocache / t_batch))
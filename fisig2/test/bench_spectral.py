@@ -0,0 +1,61 @@
+#! coding:utf-8
+"""
+bench_spectral.py
+
+SignalData.fft()相当(窓掛け+FFT)の計測. 従来の信号長そのままのfft(窓は毎回生成)と,
+spectral.pyのキャッシュした窓+next_fast_lenに0埋めしたrfftを比較する.
+slice_time_msの後によくある素数長(1931, 17011, 100003)で計測する.
+スペクトログラム<2000, 512>全フレームのリフタリングを, 従来の1フレームずつ(折り返し+複素ifft/fft)と
+ceps.liftering(実数のDCTで一括)で比較する.
+1本のスペクトル(512点)に6種類のリフタを掛ける場合の, liftering()の繰り返しとliftering_many()も比較する.
+"""
+import time
+
+import numpy as np
+
+from fisig2.ceps import liftering, liftering_many
+from fisig2.spectral import get_window, next_fast_len, rfft
+
+
+def liftering_mirror(gwtdata, lifter):
+    """従来のceps_gwt(1フレーム, fliplr + hstackで折り返し, 複素ifft/fft. mode="low")"""
+    left = np.atleast_2d(gwtdata)
+    data = np.hstack((left, np.fliplr(left)))
+    ceps = np.real(np.fft.ifft(np.log(np.abs(data))))
+    rown, cols = ceps.shape
+    w = np.hstack((np.ones((rown, lifter)), np.zeros((rown, cols - 2 * lifter)), np.ones((rown, lifter))))
+    return np.abs(np.exp(np.fft.fft(ceps * w)))[0, :cols // 2]
+
+
+def bench(f, repeat=50):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        f()
+        dt = time.time() - start
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+if __name__ == '__main__':
+    for n in (1931, 17011, 100003):
+        x = np.random.RandomState(0).randn(n)
+        m = next_fast_len(n)
+        t_old = bench(lambda: np.fft.fft(x * np.hanning(n)))
+        t_new = bench(lambda: rfft(x * get_window("hanning", n), m))
+        print("n=%-7d(nfft=%-7d) fft %8.3f[ms], cached window + fast rfft %8.3f[ms] x%.1f"
+              % (n, m, t_old * 1000, t_new * 1000, t_old / t_new))
+
+    amp = np.abs(np.random.RandomState(0).randn(2000, 512)) + 0.01
+    t_loop = bench(lambda: [liftering_mirror(a, 5) for a in amp], repeat=3)
+    t_batch = bench(lambda: liftering(amp, 5, "low"), repeat=3)
+    print("liftering <%d, %d>: per frame %8.2f[ms], batched %8.2f[ms] x%.1f"
+          % (amp.shape + (t_loop * 1000, t_batch * 1000, t_loop / t_batch)))
+
+    lifters = [(5, "low"), (15, "low"), (13, "high"), (8, "low"), (20, "high"), (30, "low")]
+    spec = amp[0]
+    t_old = bench(lambda: [liftering_mirror(spec, lifter) for lifter, mode in lifters], repeat=200)
+    t_each = bench(lambda: [liftering(spec, lifter, mode) for lifter, mode in lifters], repeat=200)
+    t_many = bench(lambda: liftering_many(spec, lifters), repeat=200)
+    print("%d lifters on one spectrum: per lifter (mirror) %6.3f[ms], liftering() %6.3f[ms], liftering_many %6.3f[ms] x%.1f"
+          % (len(lifters), t_old * 1000, t_each * 1000, t_many * 1000, t_each / t_many))
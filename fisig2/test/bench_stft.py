@@ -0,0 +1,104 @@
+#! coding:utf-8
+"""
+bench_stft.py
+
+stft()の計測. 従来のフレーム毎のfftループと, フレームのビュー<M, N>を一括rfftする実装を比較する.
+全体(約0.5[s])を窓幅256, 1024, シフト幅1/2, 1/8で解析する.
+istft()も従来のループと比較し, 40[ms]のクリップ1000本の再合成(1本ずつ, <clips, M, N>で一括)を計測する.
+StftStream / IstftStreamに10[ms]毎のチャンクを入れた時間(1回あたり, 全体)も表示する.
+"""
+import time
+
+import numpy as np
+
+from fisig2.stft import istft, stft, IstftStream, StftStream
+
+wavfilepaht = "./audio.wav"
+
+
+def stft_loop(x, win, step):
+    """従来の実装(フレーム毎のfft, 両側N列)"""
+    l, N = x.size, win.size
+    M = int(np.ceil(float(l - N + step) / step)) + N - 1
+    new_x = np.zeros(N + (M - 1) * step)
+    new_x[:l] = x
+    X = np.zeros([M, N], dtype=np.complex64)
+    for m in range(M):
+        start = step * m
+        X[m, :] = np.fft.fft(new_x[start:start + N] * win)
+    return X
+
+
+def istft_loop(X, win, step):
+    """従来の実装(フレーム毎のifftとoverlap-add)"""
+    M, N = X.shape
+    l = (M - 1) * step + N
+    x = np.zeros(l)
+    wsum = np.zeros(l)
+    for m in range(M):
+        start = step * m
+        x[start:start + N] += np.fft.ifft(X[m, :]).real * win
+        wsum[start:start + N] += win ** 2
+    pos = (wsum != 0)
+    x[pos] /= wsum[pos]
+    return x
+
+
+def bench(f, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        f()
+        dt = time.time() - start
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+if __name__ == '__main__':
+    from scipy.io import wavfile
+
+    fs, data = wavfile.read(wavfilepaht)
+    x = np.mean(data, axis=1) / 32768.
+    for nwin in (256, 1024):
+        win = np.hamming(nwin)
+        for step in (nwin // 2, nwin // 8):
+            t_loop = bench(lambda: stft_loop(x, win, step))
+            t_two = bench(lambda: stft(x, win, step))
+            t_one = bench(lambda: stft(x, win, step, onesided=True))
+            out = np.empty((stft(x, win, step, onesided=True).shape[0], nwin // 2), dtype=np.float32)
+            t_out = bench(lambda: stft(x, win, step, "db", onesided=True, out=out))
+            print("nwin=%-5d step=%-4d loop %8.2f[ms], two-sided %8.2f[ms] x%.1f, one-sided %8.2f[ms] x%.1f,"
+                  " db into out %8.2f[ms]"
+                  % (nwin, step, t_loop * 1000, t_two * 1000, t_loop / t_two, t_one * 1000, t_loop / t_one,
+                     t_out * 1000))
+            X = stft(x, win, step)
+            t_iloop = bench(lambda: istft_loop(X, win, step))
+            t_inv = bench(lambda: istft(X, win, step))
+            print("  istft loop %8.2f[ms], vectorized %8.2f[ms] x%.1f" % (t_iloop * 1000, t_inv * 1000, t_iloop / t_inv))
+
+    # 再合成: 40[ms]のクリップ1000本, 窓幅256, シフト幅64
+    n = int(0.040 * fs)
+    win = np.hamming(256)
+    starts = np.random.RandomState(0).randint(0, x.size - n, 1000)
+    clips = np.array([stft(x[s:s + n], win, 64) for s in starts])
+    t_loop = bench(lambda: [istft_loop(X, win, 64) for X in clips], repeat=1)
+    t_each = bench(lambda: [istft(X, win, 64) for X in clips], repeat=3)
+    t_batch = bench(lambda: istft(clips, win, 64), repeat=3)
+    print("istft clips=%d: loop %.2f[s], vectorized %.3f[s] x%.1f, batch %.3f[s] x%.1f"
+          % (len(clips), t_loop, t_each, t_loop / t_each, t_batch, t_loop / t_batch))
+
+    # 逐次計算: 10[ms]毎のチャンク, 窓幅1024, シフト幅256
+    chunk = int(0.010 * fs)
+    win = np.hamming(1024)
+    stream, istream = StftStream(win, 256), IstftStream(win, 256)
+    times, itimes = [], []
+    for c in range(0, x.size, chunk):
+        start = time.time()
+        X = stream.process(x[c:c + chunk])
+        times.append(time.time() - start)
+        start = time.time()
+        istream.process(X)
+        itimes.append(time.time() - start)
+    print("stream chunk=%d: StftStream %.3f[ms]/chunk (total %.2f[ms], batch %.2f[ms]), IstftStream %.3f[ms]/chunk"
+          % (chunk, np.mean(times) * 1000, np.sum(times) * 1000, bench(lambda: stft(x, win, 256)) * 1000,
+             np.mean(itimes) * 1000))
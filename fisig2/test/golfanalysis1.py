@@ -16,17 +16,20 @@ wavfilepaht = "./audio.wav"
 if __name__ == '__main__':
     # オーディオロード
     sig = SignalData().load_wav(wavfilepaht, 'M')
-    # スペクトログラム
-    spgram = sig.slice_time_ms(80, 120).gwt()
+    # スペクトログラム(インパクト音の20-25[ms]のみ解析)
+    spgram = sig.slice_time_ms(80, 120).gwt(roi_ms=(20, 25))
     # スペクトル(インパクト音)
-    spec_impact = spgram.slice_time_ms(20, 25).time_average()  # .plot().show()
+    spec_impact = spgram.time_average()  # .plot().show()
+
+    # ケプストラムは一度だけ計算する
+    spec_low5, spec_low15 = spec_impact.liftering_many([(5, "low"), (15, "low")])
 
     # ガワ感
-    g = spec_impact.liftering(lifter=5, mode="low").slice_freq_hz(1000, 4500).info().get_data()
+    g = spec_low5.slice_freq_hz(1000, 4500).info().get_data()
     gawa = np.var(g)
     print gawa
     # 硬さ
-    katasa = spec_impact.liftering(lifter=15, mode="low").slice_freq_khz(1, 4.5).cof()  # .plot().show()
+    katasa = spec_low15.slice_freq_khz(1, 4.5).cof()  # .plot().show()
     print katasa
 
     # gdata1 = spec_impact.get_logpow()
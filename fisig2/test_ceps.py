@@ -0,0 +1,64 @@
+#! coding:utf-8
+"""
+ceps.pyのテスト
+"""
+import unittest
+
+import numpy as np
+
+import ceps as cepsmodule
+from ceps import ceps_gwt, liftering, liftering_many
+
+
+def _liftering_mirror(gwtdata, lifter, mode):
+    """従来の実装(fliplr + hstackで折り返し, 複素ifft/fft. 比較用)"""
+    left = np.atleast_2d(gwtdata)
+    data = np.hstack((left, np.fliplr(left)))
+    ceps = np.real(np.fft.ifft(np.log(np.abs(data))))
+    rown, cols = ceps.shape
+    ones, zeros = np.ones((rown, lifter)), np.zeros((rown, cols - 2 * lifter))
+    if mode == "low":
+        w = np.hstack((ones, zeros, ones))
+    else:
+        w = np.hstack((1 - ones, 1 - zeros, 1 - ones))
+    return np.abs(np.exp(np.fft.fft(ceps * w)))[:, :cols // 2]
+
+
+class TestLiftering(unittest.TestCase):
+    def setUp(self):
+        self.amp = np.abs(np.random.RandomState(0).randn(20, 255)) + 0.01
+
+    def test_matches_mirror(self):
+        """全フレームをまとめた結果は折り返した従来の計算と一致する"""
+        for lifter in (0, 1, 5, 255):
+            for mode in ("low", "high"):
+                A = _liftering_mirror(self.amp, lifter, mode)
+                B = liftering(self.amp, lifter, mode)
+                np.testing.assert_allclose(np.log(B), np.log(A), rtol=0, atol=1e-10)
+
+    def test_ceps_gwt(self):
+        """1次元のスペクトルは1次元で返す. 2次元は各行"""
+        B = liftering(self.amp, 5, "low")
+        np.testing.assert_allclose(ceps_gwt(self.amp[3], 5, "low"), B[3], rtol=1e-12)
+        self.assertEqual(ceps_gwt(self.amp[3], 5, "low").shape, (255,))
+        np.testing.assert_array_equal(ceps_gwt(self.amp, 5, "low"), B)
+
+    def test_many(self):
+        """複数のリフタの結果はliftering()を1つずつ呼んだものと一致する. リフタはキャッシュする"""
+        lifters = [(5, "low"), (15, "low"), (13, "high"), (5, "low")]
+        cepsmodule._lifter_weight.cache_clear()
+        B = liftering_many(self.amp, lifters)
+        self.assertEqual(B.shape, (4,) + self.amp.shape)
+        for (lifter, mode), b in zip(lifters, B):
+            np.testing.assert_allclose(b, liftering(self.amp, lifter, mode), rtol=1e-12)
+        np.testing.assert_allclose(liftering_many(self.amp[0], lifters), B[:, 0], rtol=1e-12)
+        info = cepsmodule._lifter_weight.cache_info()
+        self.assertEqual(info.misses, 3)
+
+    def test_mode(self):
+        with self.assertRaises(ValueError):
+            liftering(self.amp, 5, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
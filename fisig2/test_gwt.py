@@ -0,0 +1,619 @@
+#! coding:utf-8
+"""
+gwt.pyのテスト
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import gwt as gwtmodule
+from gwt import gwt, gwt_adaptive, gwt_batch, gwt_cost, gwt_stream, GwtStream, KernelBankCache
+from _testdata import AudioTestCase, ImpactTestCase, load_impact
+
+
+class TestGwt(ImpactTestCase):
+    def test_contract(self):
+        data, t, fn = gwt(self.x, self.fs, a_N=64)
+        self.assertEqual(data.shape, (self.x.size, 64))
+        self.assertEqual(t.shape, (self.x.size,))
+        self.assertEqual(fn.shape, (64,))
+        self.assertTrue(np.iscomplexobj(data))
+
+    def test_fft_matches_direct(self):
+        """FFTエンジンと従来のnp.convolveループの時間平均振幅が一致する"""
+        A, t1, f1 = gwt(self.x, self.fs, a_N=128, method="direct")
+        B, t2, f2 = gwt(self.x, self.fs, a_N=128, method="fft")
+        np.testing.assert_array_equal(t1, t2)
+        np.testing.assert_array_equal(f1, f2)
+
+        amp_a = np.mean(np.abs(A), axis=0)
+        amp_b = np.mean(np.abs(B), axis=0)
+        err_db = np.abs(20 * np.log10(amp_b / amp_a))
+        self.assertLess(err_db.max(), 0.3)
+
+        # 瞬時振幅の相対RMS誤差
+        # 従来実装はカーネルが半サンプルずれているため位相は一致しない
+        amp_a, amp_b = np.abs(A), np.abs(B)
+        err = np.sqrt(np.mean((amp_a - amp_b) ** 2) / np.mean(amp_a ** 2))
+        self.assertLess(err, 0.03)
+
+    def test_workers(self):
+        """スレッド並列でも結果は同じ"""
+        A = gwt(self.x, self.fs, a_N=100, cache=False)[0]
+        B = gwt(self.x, self.fs, a_N=100, cache=False, workers=4)[0]
+        C = gwt(self.x, self.fs, a_N=100, workers=3)[0]
+        np.testing.assert_array_equal(A, B)
+        np.testing.assert_array_equal(A, C)
+
+    def test_roi(self):
+        """roi指定は全体を解析して切り出したものと一致する"""
+        A = gwt(self.x, self.fs, a_N=100)[0]
+        N = self.x.size
+        # golfanalysis1.pyの20-25[ms], 信号端を含む範囲
+        for ss, se in ((960, 1200), (0, 50), (N - 50, N), (0, N)):
+            B, t, fn = gwt(self.x, self.fs, a_N=100, roi=(ss, se))
+            self.assertEqual(B.shape, (se - ss, 100))
+            self.assertEqual(t.shape, (se - ss,))
+            np.testing.assert_allclose(B, A[ss:se], rtol=0, atol=1e-10 * np.abs(A).max())
+
+        B = gwt(self.x, self.fs, a_N=16, method="direct", roi=(960, 1200))[0]
+        np.testing.assert_array_equal(B, gwt(self.x, self.fs, a_N=16, method="direct")[0][960:1200])
+
+    def test_bad_roi(self):
+        """roiは整数に丸め, 範囲外は(-Oでも)ValueError"""
+        np.testing.assert_array_equal(gwt(self.x, self.fs, a_N=8, roi=(960.0, 1200.0))[0],
+                                      gwt(self.x, self.fs, a_N=8, roi=(960, 1200))[0])
+        N = self.x.size
+        for roi in ((-1, 10), (10, 10), (20, 10), (0, N + 1)):
+            with self.assertRaises(ValueError):
+                gwt(self.x, self.fs, a_N=8, roi=roi)
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, gwt, self.x, self.fs, 8, 0, None, "foo")
+
+
+class TestGwtStream(AudioTestCase):
+    def test_matches_gwt(self):
+        """タイルの連結はgwt()と一致し, タイルはblock列を超えない"""
+        # 最長カーネル(125[Hz])が信号長より短くなる条件
+        A = gwt(self.x, self.fs, a_N=64, f_max=8000)[0]
+
+        rng = np.random.RandomState(0)
+        edges = np.sort(rng.randint(0, self.x.size, 20))
+        chunks = np.split(self.x, edges)
+        tiles = list(gwt_stream(chunks, self.fs, a_N=64, f_max=8000, block=3000))
+
+        self.assertEqual([ss for tile, ss in tiles], list(range(0, self.x.size, 3000)))
+        self.assertTrue(all(tile.shape[0] <= 3000 for tile, ss in tiles))
+        B = np.vstack([tile for tile, ss in tiles])
+        np.testing.assert_allclose(B, A, rtol=0, atol=1e-10 * np.abs(A).max())
+
+    def test_short(self):
+        """最長カーネルより短い入力でも全列を返す"""
+        tiles = list(gwt_stream([self.x[:100], self.x[100:300]], self.fs, a_N=16))
+        self.assertEqual(sum(tile.shape[0] for tile, ss in tiles), 300)
+
+
+class TestGwtIncremental(AudioTestCase):
+    def test_matches_gwt(self):
+        """push毎に確定した列だけを返し, 連結はgwt()と一致する. 保持する入力は2 * H以下"""
+        A = gwt(self.x, self.fs, a_N=64, f_max=8000)[0]
+        stream = GwtStream(self.fs, a_N=64, f_max=8000, block=2048)
+        rng = np.random.RandomState(0)
+        edges = np.r_[0, 1, 1, 2, np.sort(rng.randint(0, self.x.size, 40)), self.x.size - 1]
+        columns = []
+        for chunk in np.split(self.x, edges):
+            received = stream.pos + stream._buf.size - stream.H + chunk.size
+            columns.append(stream.push(chunk))
+            self.assertEqual(stream.pos, max(0, received - stream.H))
+            self.assertLessEqual(stream._buf.size, 2 * stream.H)
+        columns.append(stream.flush())
+        B = np.vstack(columns)
+        self.assertEqual(B.shape, A.shape)
+        np.testing.assert_allclose(B, A, rtol=0, atol=1e-10 * np.abs(A).max())
+        with self.assertRaises(ValueError):
+            stream.push(self.x[:10])
+
+    def test_options(self):
+        """周波数軸・出力形式はgwt()と同じ"""
+        kw = dict(scale="log", f_min=200, f_max=8000, a_N=32, output="db")
+        A, t, fn = gwt(self.x, self.fs, multirate=False, **kw)
+        stream = GwtStream(self.fs, **kw)
+        np.testing.assert_array_equal(stream.fn, fn)
+        B = np.vstack([stream.push(c) for c in np.array_split(self.x, 7)] + [stream.flush()])
+        self.assertEqual(B.dtype, np.float32)
+        np.testing.assert_allclose(B, A, rtol=0, atol=1e-3)
+
+    def test_short(self):
+        stream = GwtStream(self.fs, a_N=16)
+        self.assertEqual(stream.push(self.x[:100]).shape, (0, 16))
+        self.assertEqual(stream.flush().shape, (100, 16))
+
+
+class TestGwtLog(AudioTestCase):
+    def test_axis(self):
+        data, t, fn = gwt(self.x[:1920], self.fs, a_N=60, f_min=50, f_max=20000, scale="log")
+        self.assertEqual(data.shape, (1920, 60))
+        self.assertAlmostEqual(fn[0], 50)
+        self.assertAlmostEqual(fn[-1], 20000)
+        np.testing.assert_allclose(fn[1:] / fn[:-1], (20000 / 50.) ** (1 / 59.))
+        self.assertRaises(ValueError, gwt, self.x[:1920], self.fs, 8, 0, None, scale="log")
+
+    def test_multirate(self):
+        """オクターブ毎の間引き計算は全レート計算と一致する"""
+        A, t, fn = gwt(self.x, self.fs, a_N=120, f_min=50, f_max=20000, scale="log", multirate=False)
+        B = gwt(self.x, self.fs, a_N=120, f_min=50, f_max=20000, scale="log", multirate=True)[0]
+        # 既定は全レート計算
+        np.testing.assert_array_equal(gwt(self.x, self.fs, a_N=120, f_min=50, f_max=20000, scale="log")[0], A)
+        amp_a, amp_b = np.abs(A), np.abs(B)
+
+        # 時間平均振幅
+        err_db = np.abs(20 * np.log10(np.mean(amp_b, axis=0) / np.mean(amp_a, axis=0)))
+        self.assertLess(err_db.max(), 0.15)
+        # 瞬時振幅の相対RMS誤差
+        # Vcによるカーネルの打ち切りは帯域外にサイドローブを持つため,
+        # アンチエイリアスフィルタで高域を落とした間引き計算とは完全には一致しない
+        err = np.sqrt(np.mean((amp_a - amp_b) ** 2) / np.mean(amp_a ** 2))
+        self.assertLess(err, 0.02)
+        # 間引きのない最上位オクターブ(f > Fs / 4)は同じ計算
+        top = fn > self.fs / 4.
+        self.assertTrue(top.any())
+        np.testing.assert_allclose(B[:, top], A[:, top], rtol=0, atol=1e-10 * np.abs(A).max())
+
+
+class TestGwtHop(ImpactTestCase):
+    def _check(self, **kw):
+        A, t, fn = gwt(self.x, self.fs, a_N=64, **kw)
+        N = self.x.size
+        for hop, roi in ((7, None), (48, None), (16, (100, 1500)), (5, (33, N))):
+            ss, se = roi or (0, N)
+            B, tb, fb = gwt(self.x, self.fs, a_N=64, hop=hop, roi=roi, **kw)
+            self.assertEqual(B.shape, (len(range(ss, se, hop)), 64))
+            np.testing.assert_array_equal(tb, t[ss:se:hop])
+            np.testing.assert_allclose(B, A[ss:se:hop], rtol=0, atol=1e-10 * np.abs(A).max())
+
+    def test_linear(self):
+        """hop指定は全体を解析して[ss:se:hop]で間引いたものと一致する"""
+        self._check()
+
+    def test_log(self):
+        self._check(scale="log", f_min=200, multirate=False)
+
+    def test_multirate(self):
+        """間引いた行も補間後の値と一致する(hopが間引き率の倍数でない場合を含む)"""
+        self._check(scale="log", f_min=200, multirate=True)
+
+    def test_bad_hop(self):
+        with self.assertRaises(ValueError):
+            gwt(self.x, self.fs, a_N=8, hop=0)
+
+
+class TestGwtDtype(ImpactTestCase):
+    """complex64の精度(float64基準). 実測は最大誤差 2e-7 * peak, -60dB以上のビンで 6e-4 dB以下."""
+
+    def _check(self, **kw):
+        A = gwt(self.x, self.fs, a_N=64, **kw)[0]
+        B = gwt(self.x, self.fs, a_N=64, dtype=np.complex64, **kw)[0]
+        self.assertEqual(A.dtype, np.complex128)
+        self.assertEqual(B.dtype, np.complex64)
+        peak = np.abs(A).max()
+        self.assertLess(np.abs(A - B).max(), 1e-6 * peak)
+        dba = 20 * np.log10(np.abs(A) / peak)
+        dbb = 20 * np.log10(np.abs(B) / peak)
+        mask = dba > -60
+        self.assertLess(np.abs(dba - dbb)[mask].max(), 1e-2)
+
+    def test_linear(self):
+        self._check()
+
+    def test_multirate(self):
+        self._check(scale="log", f_min=200, multirate=True)
+
+    def test_hop(self):
+        self._check(hop=7, roi=(100, 1500))
+
+    def test_stream(self):
+        chunks = np.array_split(self.x, 5)
+        tiles = [tile for tile, ss in gwt_stream(chunks, self.fs, a_N=16, block=700, dtype=np.complex64)]
+        self.assertTrue(all(tile.dtype == np.complex64 for tile in tiles))
+
+    def test_bad_dtype(self):
+        with self.assertRaises(ValueError):
+            gwt(self.x, self.fs, a_N=8, dtype=np.float32)
+
+
+class TestGwtOutput(ImpactTestCase):
+    def _check(self, **kw):
+        """output="amp", "db"は複素数の結果の|W|, 20log10|W|と(float32の丸めの範囲で)一致する"""
+        A = gwt(self.x, self.fs, a_N=64, **kw)[0]
+        amp = np.abs(A)
+        for output, ref, atol in (("amp", amp, 1e-6 * amp.max()),
+                                  ("db", 20 * np.log10(np.maximum(amp, 1e-8)), 1e-4)):
+            B = gwt(self.x, self.fs, a_N=64, output=output, **kw)[0]
+            self.assertEqual(B.dtype, np.float32)
+            np.testing.assert_allclose(B, ref, rtol=0, atol=atol)
+
+    def test_linear(self):
+        self._check()
+
+    def test_multirate(self):
+        self._check(scale="log", f_min=200, multirate=True)
+        self._check(scale="log", f_min=200, multirate=True, hop=5, roi=(33, 1800))
+
+    def test_direct(self):
+        B = gwt(self.x, self.fs, a_N=8, method="direct", output="amp")[0]
+        np.testing.assert_allclose(B, np.abs(gwt(self.x, self.fs, a_N=8, method="direct")[0]), rtol=1e-6)
+
+    def test_bad_output(self):
+        with self.assertRaises(ValueError):
+            gwt(self.x, self.fs, a_N=8, output="phase")
+
+    def test_bad_shape(self):
+        """gwt()の入力は1次元の信号のみ"""
+        with self.assertRaises(ValueError):
+            gwt(np.array([self.x, self.x]), self.fs, a_N=8)
+
+
+class TestGwtOut(unittest.TestCase):
+    def setUp(self):
+        self.x, self.fs = load_impact()
+        self.tmpdir = tempfile.mkdtemp()
+        self.tile = gwtmodule._OUT_TILE
+        gwtmodule._OUT_TILE = 300  # 複数タイルに分ける
+
+    def tearDown(self):
+        gwtmodule._OUT_TILE = self.tile
+        shutil.rmtree(self.tmpdir)
+
+    def test_array(self):
+        """outへのタイル毎の書き込みは一括計算と一致する"""
+        for kw in (dict(), dict(scale="log", f_min=200, multirate=True), dict(hop=7, roi=(33, 1800), output="db")):
+            A = gwt(self.x, self.fs, a_N=32, **kw)[0]
+            out = np.empty(A.shape, dtype=A.dtype)
+            B = gwt(self.x, self.fs, a_N=32, out=out, **kw)[0]
+            self.assertIs(B, out)
+            np.testing.assert_allclose(B, A, rtol=0, atol=1e-10 * np.abs(A).max())
+
+    def test_multirate_tile(self):
+        """multirateでもタイル毎に計算するのはそのタイルの範囲だけ(間引いた行を全長で計算し直さない)"""
+        spans = []
+        gwt_fft = gwtmodule._gwt_fft
+
+        def _record(X, Fs, fn, sigma, Vc, cache, workers, n0=0, n1=None, *args, **kw):
+            spans.append(((X.shape[0] if n1 is None else n1) - n0) * (self.fs / Fs))
+            return gwt_fft(X, Fs, fn, sigma, Vc, cache, workers, n0, n1, *args, **kw)
+
+        gwtmodule._gwt_fft = _record
+        try:
+            A = gwt(self.x, self.fs, a_N=32, scale="log", f_min=200, multirate=True,
+                    out=np.empty((self.x.size, 32), dtype=complex))[0]
+        finally:
+            gwtmodule._gwt_fft = gwt_fft
+        # 間引き率dの行は補間のために次の標本点(d標本)まで余分に計算する
+        self.assertLessEqual(max(spans), gwtmodule._OUT_TILE + 2 * 2 ** 6)
+        np.testing.assert_allclose(A, gwt(self.x, self.fs, a_N=32, scale="log", f_min=200, multirate=True)[0],
+                                   rtol=0, atol=1e-10 * np.abs(A).max())
+
+    def test_memmap(self):
+        """パス指定はnp.lib.format.open_memmapのファイルに書き込み, np.loadで開き直せる"""
+        path = os.path.join(self.tmpdir, "gwt.npy")
+        A = gwt(self.x, self.fs, a_N=32, dtype=np.complex64, hop=3)[0]
+        B = gwt(self.x, self.fs, a_N=32, dtype=np.complex64, hop=3, out=path)[0]
+        self.assertIsInstance(B, np.memmap)
+        del B
+        C = np.load(path, mmap_mode="r")
+        self.assertEqual(C.dtype, np.complex64)
+        np.testing.assert_allclose(C, A, rtol=0, atol=1e-6 * np.abs(A).max())
+
+    def test_shape(self):
+        with self.assertRaises(AssertionError):
+            gwt(self.x, self.fs, a_N=32, out=np.empty((10, 32), dtype=complex))
+
+
+class TestGwtFreqs(ImpactTestCase):
+    def test_subset(self):
+        """freqsで選んだ周波数の結果は全周波数を解析した列と一致する(golfanalysis1.pyの1-4.5kHz)"""
+        A, t, fn = gwt(self.x, self.fs, a_N=256)
+        sel = np.nonzero((fn >= 1000) & (fn <= 4500))[0]
+        for idx in (sel, sel[::-1], sel[[0, 5, -1]]):
+            B, tb, fb = gwt(self.x, self.fs, freqs=fn[idx])
+            np.testing.assert_array_equal(fb, fn[idx])
+            np.testing.assert_allclose(B, A[:, idx], rtol=0, atol=1e-10 * np.abs(A).max())
+
+    def test_multirate(self):
+        A, t, fn = gwt(self.x, self.fs, a_N=64, scale="log", f_min=200, multirate=True)
+        idx = [3, 40, 10, 63]
+        B = gwt(self.x, self.fs, freqs=fn[idx], multirate=True)[0]
+        np.testing.assert_allclose(B, A[:, idx], rtol=0, atol=1e-10 * np.abs(A).max())
+
+    def test_band(self):
+        fn = gwt(self.x, self.fs, a_N=8, band=(1000, 4500))[2]
+        np.testing.assert_allclose(fn, np.linspace(1000, 4500, 8))
+        fn = gwt(self.x, self.fs, a_N=8, band=(1000, 4500), scale="log")[2]
+        np.testing.assert_allclose(fn, np.geomspace(1000, 4500, 8))
+
+    def test_bad_freqs(self):
+        for freqs in ([], [0, 1000], [-5.]):
+            with self.assertRaises(ValueError):
+                gwt(self.x, self.fs, freqs=freqs)
+
+
+class TestGwtAdaptive(ImpactTestCase):
+    def test_matches_dense(self):
+        """各列は細かい軸で全体を解析したgwt()の同じ周波数の列と一致する"""
+        for kw, a_N in ((dict(), 64 * 4), (dict(scale="log", f_min=100), 63 * 4 + 1),
+                        (dict(hop=5, output="db"), 64 * 4)):
+            A, t, fn = gwt_adaptive(self.x, self.fs, a_N=64, refine=4, **kw)
+            D, t2, fd = gwt(self.x, self.fs, a_N=a_N, **kw)
+            np.testing.assert_array_equal(t, t2)
+            self.assertTrue(np.all(np.diff(fn) > 0))
+            self.assertLess(fn.size, fd.size)
+            index = np.searchsorted(fd, fn)
+            np.testing.assert_allclose(fd[index], fn, rtol=1e-12)
+            np.testing.assert_allclose(A, D[:, index], rtol=0, atol=1e-6 * np.abs(D).max())
+            # 粗い軸は全て含む
+            coarse = gwt(self.x, self.fs, a_N=64, **kw)[2]
+            self.assertTrue(np.all(np.isin(np.searchsorted(fd, coarse - 1e-9), index)))
+
+    def test_threshold(self):
+        """閾値が高いほど追加するビンが少ない. 0[dB]はピークのビンの近傍のみ"""
+        sizes = [gwt_adaptive(self.x, self.fs, a_N=32, refine=4, threshold_db=th)[2].size
+                 for th in (-1000, -20, -10, 0)]
+        self.assertEqual(sizes[0], 32 * 4)
+        self.assertEqual(sizes[-1], 32 + 3)
+        self.assertTrue(all(a >= b for a, b in zip(sizes, sizes[1:])))
+        with self.assertRaises(ValueError):
+            gwt_adaptive(self.x, self.fs, freqs=[1000.])
+
+
+class TestGwtMean(ImpactTestCase):
+    def test_mean(self):
+        """output="mean"はroi内の振幅(下限1e-8)の時間平均と一致する"""
+        ss, se = 960, 1200
+        for kw in (dict(), dict(scale="log", f_min=200), dict(hop=3), dict(method="direct", a_N=8)):
+            kw.setdefault("a_N", 64)
+            A = gwt(self.x, self.fs, roi=(ss, se), **kw)[0]
+            ref = np.maximum(np.abs(A), 1e-8).mean(axis=0)
+            B, t, fn = gwt(self.x, self.fs, roi=(ss, se), output="mean", **kw)
+            self.assertEqual(B.shape, (1, kw["a_N"]))
+            self.assertEqual(B.dtype, np.float64)
+            np.testing.assert_allclose(B[0], ref, rtol=1e-10)
+
+
+class TestGwtBatch(unittest.TestCase):
+    def setUp(self):
+        x, self.fs = load_impact()
+        # 同じ長さのクリップを並べる
+        rng = np.random.RandomState(0)
+        self.X = np.array([np.roll(x, k) + 1e-3 * rng.randn(x.size) for k in (0, 37, 500, 1111)])
+
+    def test_matches_loop(self):
+        """gwt_batchはクリップ毎のgwt()と一致する"""
+        for kw in (dict(), dict(scale="log", f_min=200, multirate=True), dict(hop=4, output="db"),
+                   dict(roi=(500, 900), output="mean"), dict(method="iir", a_N=8)):
+            kw.setdefault("a_N", 32)
+            A, t, fn = gwt_batch(self.X, self.fs, **kw)
+            ref = np.array([gwt(x, self.fs, **kw)[0] for x in self.X])
+            self.assertEqual(A.shape, ref.shape)
+            np.testing.assert_array_equal(A, ref)
+            np.testing.assert_array_equal(t, gwt(self.X[0], self.fs, **kw)[1])
+            B = gwt_batch(self.X, self.fs, stack=False, **kw)[0]
+            self.assertEqual(len(B), len(self.X))
+            np.testing.assert_array_equal(np.array(B), ref)
+
+    def test_bank_once(self):
+        """cache=Falseでもカーネルバンクは1回だけ作る"""
+        built = []
+        kernel_bank = gwtmodule._kernel_bank
+
+        def count(*args):
+            built.append(1)
+            return kernel_bank(*args)
+
+        gwtmodule._kernel_bank = count
+        try:
+            gwt_batch(self.X, self.fs, a_N=16, cache=False)
+        finally:
+            gwtmodule._kernel_bank = kernel_bank
+        self.assertEqual(len(built), 1)
+
+    def test_out(self):
+        A = gwt_batch(self.X, self.fs, a_N=16)[0]
+        out = np.empty_like(A)
+        self.assertIs(gwt_batch(self.X, self.fs, a_N=16, out=out)[0], out)
+        np.testing.assert_array_equal(out, A)
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "batch.npy")
+            B = gwt_batch(self.X, self.fs, a_N=16, out=path)[0]
+            self.assertIsInstance(B, np.memmap)
+            del B
+            np.testing.assert_array_equal(np.load(path), A)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_bad_shape(self):
+        with self.assertRaises(ValueError):
+            gwt_batch(self.X[0], self.fs, a_N=8)
+        with self.assertRaises(ValueError):
+            gwt_batch(self.X, self.fs, a_N=8, out=np.empty((4, 10, 8), dtype=complex))
+
+
+class TestGwtPrecision(ImpactTestCase):
+    def _reference(self, fn, sigma=5):
+        """打ち切りなしの畳み込み. 閉形式のカーネルを信号全体(±(N-1)サンプル)で計算する"""
+        x, N = self.x, self.x.size
+        d = np.arange(-(N - 1), N) / float(self.fs)
+        R = np.empty((N, fn.size), dtype=complex)
+        for i, f in enumerate(fn):
+            a = 1. / f
+            R[:, i] = np.convolve(x, gwtmodule._psi(a, 0., d, sigma) / np.sqrt(a))[N - 1:2 * N - 1]
+        return R
+
+    def _err_db(self, A, R, floor=-40):
+        """ピークからfloor[dB]以内の点での最大|dB誤差|"""
+        mask = np.abs(R) > np.abs(R).max() * 10 ** (floor / 20.)
+        return np.abs(20 * np.log10(np.abs(A[mask]) / np.abs(R[mask]))).max()
+
+    def test_error_bound(self):
+        """各プリセットの誤差は文書化した上限(_PRECISION_DB)以下"""
+        for kw in (dict(), dict(scale="log", f_min=100)):
+            fn = gwt(self.x, self.fs, a_N=32, **kw)[2]
+            R = self._reference(fn)
+            for precision, bound in gwtmodule._PRECISION_DB.items():
+                A = gwt(self.x, self.fs, a_N=32, precision=precision, **kw)[0]
+                self.assertLess(self._err_db(A, R), bound, (kw, precision))
+            # 従来のVc(1e-5)は上限を満たさない
+            A = gwt(self.x, self.fs, a_N=32, **kw)[0]
+            self.assertGreater(self._err_db(A, R), gwtmodule._PRECISION_DB["fast"])
+
+    def test_cost(self):
+        """精度が高いほどカーネルが長く計算量が多い"""
+        costs = [gwt_cost(self.x.size, self.fs, a_N=32, precision=p) for p in ("fast", "balanced", "exact")]
+        for a, b in zip(costs, costs[1:]):
+            self.assertLess(a["max_taps"], b["max_taps"])
+            self.assertLess(a["flops"], b["flops"])
+        # カーネル長は信号長で切らない(最大2N-1)
+        self.assertLessEqual(costs[-1]["max_taps"], 2 * self.x.size - 1)
+        self.assertEqual(gwt_cost(self.x.size, self.fs, a_N=32)["taps"].shape, (32,))
+
+    def test_sigma_vc(self):
+        A = gwt(self.x, self.fs, a_N=16, Vc=1e-24)[0]
+        B = gwt(self.x, self.fs, a_N=16, precision="balanced")[0]
+        # 同じVcでも信号長での打ち切り有無が異なる
+        self.assertEqual(A.shape, B.shape)
+        fn = gwt(self.x, self.fs, a_N=16)[2]
+        C = gwt(self.x, self.fs, a_N=16, sigma=3, precision="exact")[0]
+        self.assertLess(self._err_db(C, self._reference(fn, sigma=3)), gwtmodule._PRECISION_DB["exact"])
+        with self.assertRaises(ValueError):
+            gwt(self.x, self.fs, a_N=16, Vc=1e-8, precision="fast")
+        with self.assertRaises(ValueError):
+            gwt(self.x, self.fs, a_N=16, precision="best")
+
+    def test_linear_f_min(self):
+        """線形軸でもf_minを反映する(f_min=0は従来と同じ軸)"""
+        fn = gwt(self.x, self.fs, a_N=16, f_min=1000, f_max=5000)[2]
+        np.testing.assert_allclose(fn, np.linspace(1000, 5000, 17)[1:])
+        fn = gwt(self.x, self.fs, a_N=16)[2]
+        np.testing.assert_allclose(fn, np.linspace(0, self.fs / 2., 17)[1:])
+
+
+class TestGwtIir(ImpactTestCase):
+    def _compare(self, A, R):
+        """時間平均振幅の最大dB差と瞬時振幅の相対RMS誤差"""
+        err_db = np.abs(20 * np.log10(np.mean(np.abs(A), axis=0) / np.mean(np.abs(R), axis=0))).max()
+        amp_a, amp_r = np.abs(A), np.abs(R)
+        return err_db, np.sqrt(np.mean((amp_a - amp_r) ** 2) / np.mean(amp_r ** 2))
+
+    def test_gauss(self):
+        """再帰フィルタのガウス窓はサンプルしたガウス窓と形状で2%以内. 信号の端も0埋めと同じ"""
+        for s in (20., 900., 17000.):
+            M = int(12 * s) + 1
+            ref = np.exp(-(np.arange(M) - M // 2) ** 2 / (2 * s * s))
+            ref /= ref.sum()
+            x = np.zeros(M)
+            x[M // 2] = 1
+            self.assertLess(np.abs(gwtmodule._gauss_iir(x, s) - ref).max() / ref.max(), 0.02)
+            edge = gwtmodule._gauss_iir(x[:M // 2 + 1], s)
+            np.testing.assert_allclose(edge, gwtmodule._gauss_iir(x, s)[:M // 2 + 1], rtol=0, atol=1e-9 * ref.max())
+
+    def test_matches_direct(self):
+        """カーネルが信号長に収まる高域では打ち切りなしのmethod="direct"と一致する"""
+        freqs = np.linspace(2000, 20000, 40)
+        A = gwt(self.x, self.fs, freqs=freqs, method="iir")[0]
+        D = gwt(self.x, self.fs, freqs=freqs, method="direct", Vc=1e-32)[0]
+        err_db, err = self._compare(A, D)
+        self.assertLess(err_db, 0.3)
+        self.assertLess(err, 0.03)
+
+    def test_matches_exact(self):
+        """全帯域でprecision="exact"のFFTエンジンと一致する"""
+        for kw in (dict(), dict(scale="log", f_min=100)):
+            A = gwt(self.x, self.fs, a_N=64, method="iir", **kw)[0]
+            E = gwt(self.x, self.fs, a_N=64, precision="exact", **kw)[0]
+            err_db, err = self._compare(A, E)
+            self.assertLess(err_db, 0.2, kw)
+            self.assertLess(err, 0.02, kw)
+
+    def test_options(self):
+        A = gwt(self.x, self.fs, a_N=16, method="iir")[0]
+        B = gwt(self.x, self.fs, a_N=16, method="iir", roi=(100, 1500), hop=7)[0]
+        np.testing.assert_array_equal(B, A[100:1500:7])
+        C = gwt(self.x, self.fs, a_N=16, method="iir", output="db")[0]
+        np.testing.assert_allclose(C, 20 * np.log10(np.abs(A)), rtol=0, atol=1e-4)
+        out = np.empty_like(A)
+        gwt(self.x, self.fs, a_N=16, method="iir", out=out)
+        np.testing.assert_array_equal(out, A)
+
+
+class TestKernelBankCache(unittest.TestCase):
+    def setUp(self):
+        self.x, self.fs = load_impact()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_hit_miss(self):
+        cache = KernelBankCache()
+        A = gwt(self.x, self.fs, a_N=64, cache=cache)[0]
+        B = gwt(self.x, self.fs, a_N=64, cache=cache)[0]
+        C = gwt(self.x, self.fs, a_N=64, cache=False)[0]
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        np.testing.assert_array_equal(A, B)
+        np.testing.assert_array_equal(A, C)
+
+        # パラメータが違えば別のバンク
+        gwt(self.x, self.fs, a_N=32, cache=cache)
+        gwt(self.x[:1000], self.fs, a_N=64, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertEqual(cache.stats()["banks"], 3)
+
+    def test_lru_eviction(self):
+        xs = self.x[:1000], self.x[:1200], self.x[:1400]
+        sizes = []
+        for x in xs:
+            cache = KernelBankCache()
+            gwt(x, self.fs, a_N=16, cache=cache)
+            sizes.append(cache.stats()["nbytes"])
+
+        cache = KernelBankCache(max_bytes=sizes[0] + max(sizes[1:]))
+        gwt(xs[0], self.fs, a_N=16, cache=cache)
+        gwt(xs[1], self.fs, a_N=16, cache=cache)
+        gwt(xs[0], self.fs, a_N=16, cache=cache)  # xs[0]を最近使用に
+        gwt(xs[2], self.fs, a_N=16, cache=cache)  # xs[1]が破棄される
+        self.assertEqual(cache.stats()["nbytes"], sizes[0] + sizes[2])
+        self.assertEqual(cache.stats()["banks"], 2)
+
+        gwt(xs[0], self.fs, a_N=16, cache=cache)
+        self.assertEqual(cache.hits, 2)
+        gwt(xs[1], self.fs, a_N=16, cache=cache)
+        self.assertEqual(cache.misses, 4)
+
+    def test_oversized(self):
+        """max_bytesを超えるバンクは作らず(キャッシュもディスクも使わない), 結果はcache=Falseと同じ"""
+        cache = KernelBankCache(max_bytes=2 ** 10, cache_dir=self.tmpdir)
+        A = gwt(self.x, self.fs, a_N=64, cache=cache)[0]
+        gwt(self.x, self.fs, a_N=64, cache=cache)
+        stats = cache.stats()
+        self.assertEqual((stats["skips"], stats["misses"], stats["banks"], stats["nbytes"]), (2, 0, 0, 0))
+        self.assertEqual(os.listdir(self.tmpdir), [])
+        np.testing.assert_array_equal(A, gwt(self.x, self.fs, a_N=64, cache=False)[0])
+
+    def test_disk(self):
+        cache = KernelBankCache(cache_dir=self.tmpdir)
+        A = gwt(self.x, self.fs, a_N=64, cache=cache)[0]
+        self.assertEqual(len(os.listdir(self.tmpdir)), 1)
+
+        # 別プロセス相当: 空のキャッシュでもディスクから読む
+        cache = KernelBankCache(cache_dir=self.tmpdir)
+        B = gwt(self.x, self.fs, a_N=64, cache=cache)[0]
+        self.assertEqual((cache.disk_hits, cache.misses), (1, 0))
+        np.testing.assert_array_equal(A, B)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,3 @@
-
 #! coding:utf-8
 """
 パッケージのテスト
@@ -7,12 +6,45 @@ print(__file__)
 import os
 import unittest
 
+import numpy as np
+
+from _testdata import AUDIO_PATH
+from aid import aid
+
+
+
+def _import_signaldata():
+    """fisig2パッケージのSignalDataを読み込む.
+    signaldata.pyは相対インポート(from .core import *)なのでパッケージとして読む必要があるが,
+    旧パッケージのfisig2/core/がcore.pyを隠すので, fisig2.coreだけはcore.pyから読み込んでおく."""
+    import importlib.util
+    import sys
+
+    if "fisig2.signaldata" not in sys.modules:
+        rootpath = os.path.dirname(os.path.abspath(__file__))
+        spec = importlib.util.spec_from_file_location("fisig2", os.path.join(rootpath, "__init__.py"),
+                                                      submodule_search_locations=[rootpath])
+        package = importlib.util.module_from_spec(spec)
+        sys.modules["fisig2"] = package
+        core_spec = importlib.util.spec_from_file_location("fisig2.core", os.path.join(rootpath, "core.py"))
+        core = importlib.util.module_from_spec(core_spec)
+        sys.modules["fisig2.core"] = core
+        core_spec.loader.exec_module(core)
+        spec.loader.exec_module(package)
+    return sys.modules["fisig2.signaldata"].SignalData
+
+
 try:
-    from signaldata import SignalData
+    SignalData = _import_signaldata()
     import_err = False
 except:
     import_err = True
 
+
+def _load_impact():
+    """tests/audio.wavの80-120[ms]のSignalData(_testdata.load_impact()と同じ区間)"""
+    return SignalData().load_wav(AUDIO_PATH, 'M').slice_time_ms(80, 120)
+
 class TestFisig2(unittest.TestCase):
     def test_signaldata_import(self):
         self.assertFalse(import_err, "from signaldata import SignalData is Error")
@@ -30,5 +62,266 @@ class TestFisig2(unittest.TestCase):
         self.assertTrue(sig.name, "audio.wav")
 
 
+@unittest.skipIf(import_err, "from signaldata import SignalData is Error")
+class TestCopyAudit(unittest.TestCase):
+    """load_wav -> slice_time_ms -> gwt -> SpectrogramData -> time_average で余分なコピーをしない"""
+
+    def setUp(self):
+        self.sig = SignalData().load_wav(AUDIO_PATH, 'M')
+
+    def test_getter_view(self):
+        """getterはスライス範囲の読み取り専用のビュー. copy=Trueは書き換え可能なコピー"""
+        sig = self.sig
+        base = aid(sig._data)
+        sig.slice_time_ms(80, 120)
+        x = sig.get_data()
+        self.assertEqual(aid(x), base + sig._x_ss * sig._data.itemsize)
+        self.assertFalse(x.flags.writeable)
+        with self.assertRaises(ValueError):
+            x[0] = 0
+        self.assertEqual(aid(sig.get_xdata()), aid(sig._xdata) + sig._x_ss * sig._xdata.itemsize)
+        y = sig.get_data(copy=True)
+        self.assertNotEqual(aid(y), aid(x))
+        self.assertTrue(y.flags.writeable)
+        np.testing.assert_array_equal(y, x)
+
+    def test_chain(self):
+        """gwtに渡るのは信号のビュー, SpectrogramDataはgwtの結果をそのまま持つ(既定の引数のまま)"""
+        sig = self.sig
+        base = aid(sig._data)
+        seen = []
+        _gwt = sig._gwt
+
+        def gwt(audio_data, *args, **kw):
+            seen.append(aid(audio_data))
+            result = _gwt(audio_data, *args, **kw)
+            seen.extend(aid(a) for a in result)
+            return result
+
+        sig._gwt = gwt
+        spgram = sig.slice_time_ms(80, 120).gwt(a_N=64)
+        self.assertEqual(spgram._data.dtype, np.complex64)
+        self.assertEqual(seen[0], base + sig._x_ss * sig._data.itemsize)
+        self.assertEqual([aid(spgram._data), aid(spgram._xdata), aid(spgram._ydata)], seen[1:])
+        self.assertEqual(aid(spgram.get_data()), aid(spgram._data))
+        # 時間平均のスペクトルの周波数軸はスペクトログラムの周波数軸のビュー
+        spec = spgram.time_average()
+        self.assertEqual(aid(spec._xdata), aid(spgram._ydata))
+        self.assertEqual(aid(spec.get_data()), aid(spec._data))
+
+
+@unittest.skipIf(import_err, "from signaldata import SignalData is Error")
+class TestSpectrogramRoi(unittest.TestCase):
+    """gwt(roi_ms=...)のスペクトログラムのslice_time_msは信号の先頭からの時刻"""
+
+    def setUp(self):
+        self.sig = _load_impact()
+
+    def test_slice(self):
+        full = self.sig.gwt(a_N=64)
+        roi = self.sig.gwt(a_N=64, roi_ms=(20, 25))
+        self.assertEqual(roi.get_origin(), self.sig._ms2smp(20))
+        A = full.slice_time_ms(21, 24).get_data()
+        B = roi.slice_time_ms(21, 24).get_data()
+        self.assertEqual(B.shape, A.shape)
+        np.testing.assert_allclose(B, A, rtol=0, atol=1e-5 * np.abs(A).max())
+        np.testing.assert_allclose(roi.time_average().get_data(), full.time_average().get_data(), rtol=1e-4)
+        np.testing.assert_allclose(roi._smp2ms(0), 20., rtol=0, atol=1e-9)
+
+    def test_out_of_range(self):
+        """はみ出した範囲は切り詰め, 計算した範囲と重ならないときは例外(空のデータで0の平均を返さない)"""
+        full = self.sig.gwt(a_N=64)
+        n = full.get_xdata().shape[0]
+        self.assertEqual(full.slice_time_ms(0, 40.05).get_xdata().shape[0], n)
+        self.assertEqual(full.slice_time_smp(-5, n + 5).get_xdata().shape[0], n)
+        roi = self.sig.gwt(a_N=64, roi_ms=(20, 25))
+        np.testing.assert_array_equal(roi.slice_time_ms(21, 30).get_data(), roi.slice_time_ms(21, 25).get_data())
+        with self.assertRaises(ValueError):
+            roi.slice_time_ms(10, 15)
+
+
+@unittest.skipIf(import_err, "from signaldata import SignalData is Error")
+class TestMemo(unittest.TestCase):
+    """get_amp()などの派生量はスライス範囲とデータが変わるまで保持する"""
+
+    def setUp(self):
+        self.spgram = _load_impact().gwt(a_N=64)
+        self.spec = self.spgram.time_average()
+
+    def _assert_amp(self, data):
+        """保持している振幅が今のデータ(スライス範囲)から計算したものと同じ"""
+        amp = data.get_amp()
+        np.testing.assert_array_equal(amp, np.clip(np.abs(data.get_data()), 1e-8, 1e32))
+        return amp
+
+    def test_reuse(self):
+        for data in (self.spec, self.spgram):
+            amp = self._assert_amp(data)
+            self.assertIs(data.get_amp(), amp)
+            self.assertFalse(amp.flags.writeable)
+            with self.assertRaises(ValueError):
+                amp[0] = 0
+            logpow = data.get_logpow()
+            self.assertIs(data.get_logpow(), logpow)
+            self.assertIs(data.get_pow_norm(), data.get_pow_norm())
+
+    def test_slice(self):
+        """slice_freq_hz, slice_time_ms, slc()でスライス範囲が変わると計算し直す"""
+        spec = self.spec
+        amp = spec.get_amp()
+        spec.slice_freq_hz(1000, 5000)
+        sliced = self._assert_amp(spec)
+        self.assertIsNot(sliced, amp)
+        self.assertLess(sliced.shape[0], amp.shape[0])
+        spec.slc()
+        np.testing.assert_array_equal(self._assert_amp(spec), amp)
+
+        spgram = self.spgram
+        amp = spgram.get_amp()
+        spgram.slice_time_ms(5, 10)
+        self.assertIsNot(self._assert_amp(spgram), amp)
+
+    def test_set_data(self):
+        """_set_data()で差し替えると計算し直す. その場で書き換えたときは_memo_clear()で捨てる"""
+        spec = self.spec
+        amp = spec.get_amp()
+        spec._set_data(spec._data * 2)
+        np.testing.assert_allclose(self._assert_amp(spec), 2 * amp)
+        # lfilteringは_set_dataで結果を持つ
+        spec.lfiltering([0.5], [1])
+        np.testing.assert_allclose(self._assert_amp(spec), amp)
+
+        spec._data *= 2
+        self.assertIs(spec.get_amp(), spec.get_amp())
+        spec._memo_clear()
+        np.testing.assert_allclose(self._assert_amp(spec), 2 * amp)
+
+    def test_disabled(self):
+        """memoize = Falseは毎回計算し, 書き換え可能な配列を返す(クラスの既定は変えない)"""
+        spec = self.spec
+        spec.memoize = False
+        amp = spec.get_amp()
+        self.assertIsNot(spec.get_amp(), amp)
+        self.assertTrue(amp.flags.writeable)
+        self.assertTrue(spec.get_logpow().flags.writeable)
+        amp[0] = 0
+        self.assertNotEqual(spec.get_amp()[0], 0)
+        self.assertTrue(self.spgram.memoize)
+
+
+@unittest.skipIf(import_err, "from signaldata import SignalData is Error")
+class TestWrappers(unittest.TestCase):
+    """SignalData, SpectrogramData, SpectrumDataのラッパーが下回り(gwt, stft, ceps)と同じ結果を返す"""
+
+    def setUp(self):
+        import importlib
+        import tempfile
+
+        self.sig = _load_impact()
+        self.tmpdir = tempfile.mkdtemp()
+        self.spectrogram = importlib.import_module("fisig2.spectrogram")
+        self.ceps = importlib.import_module("fisig2.ceps")
+
+    def tearDown(self):
+        import shutil
+
+        shutil.rmtree(self.tmpdir)
+
+    def _assert_same(self, A, B):
+        """データ・軸・fs・hop・origin・kindが一致する"""
+        np.testing.assert_array_equal(B.get_data(), A.get_data())
+        np.testing.assert_array_equal(B.get_xdata(), A.get_xdata())
+        np.testing.assert_array_equal(B.get_ydata(), A.get_ydata())
+        self.assertEqual((B.get_fs(), B.get_hop(), B.get_origin(), B.get_kind()),
+                         (A.get_fs(), A.get_hop(), A.get_origin(), A.get_kind()))
+
+    def test_save_load_npy(self):
+        path = os.path.join(self.tmpdir, "gwt.npy")
+        A = self.sig.gwt(a_N=32, roi_ms=(20, 25), time_resolution_ms=0.1)
+        A.save_npy(path)
+        B = self.spectrogram.SpectrogramData.load_npy(path)
+        self.assertIsInstance(B._data, np.memmap)
+        self._assert_same(A, B)
+        del B
+
+    def test_gwt_out(self):
+        """gwt(out=path)はファイルに書き込んだ結果を参照し, load_npyで開き直せる"""
+        path = os.path.join(self.tmpdir, "gwt.npy")
+        A = self.sig.gwt(a_N=32, roi_ms=(20, 25))
+        B = self.sig.gwt(a_N=32, roi_ms=(20, 25), out=path)
+        self.assertIsInstance(B._data, np.memmap)
+        self._assert_same(A, B)
+        del B
+        self._assert_same(A, self.spectrogram.SpectrogramData.load_npy(path))
+
+    def test_stft_out(self):
+        path = os.path.join(self.tmpdir, "stft.npy")
+        for output in ("complex", "db"):
+            A = self.sig.stft(nwin=128, step=32, output=output)
+            B = self.sig.stft(nwin=128, step=32, output=output, out=path)
+            self.assertIsInstance(B._data, np.memmap)
+            self._assert_same(A, B)
+            del B
+            self._assert_same(A, self.spectrogram.SpectrogramData.load_npy(path))
+
+    def test_kind(self):
+        """output="amp", "db"のSpectrogramDataのgetterは複素数のものと(float32の丸めの範囲で)一致する"""
+        for method, kw in ((self.sig.gwt, dict(a_N=32)), (self.sig.stft, dict(nwin=128, step=32))):
+            C = method(**kw)
+            amp = C.get_amp()
+            for output, ref, atol in (("amp", amp, 1e-6 * amp.max()), ("db", C.get_logpow(), 1e-4)):
+                S = method(output=output, **kw)
+                self.assertEqual(S.get_kind(), output)
+                self.assertEqual(S.get_data().dtype, np.float32)
+                np.testing.assert_allclose(S.get_data(), ref, rtol=0, atol=atol)
+                np.testing.assert_allclose(S.get_amp(), amp, rtol=1e-4, atol=1e-6 * amp.max())
+                np.testing.assert_allclose(S.get_logpow(), C.get_logpow(), rtol=0, atol=1e-3)
+                np.testing.assert_allclose(S.time_average().get_data(), C.time_average().get_data(), rtol=1e-4)
+
+    def test_spectrogram_liftering(self):
+        """時間タイル毎のリフタリングは全フレームを一度にceps.lifteringしたものと一致する"""
+        tile = self.spectrogram._TIME_TILE
+        self.spectrogram._TIME_TILE = 7
+        try:
+            spgram = self.sig.gwt(a_N=32, roi_ms=(20, 25)).slice_time_ms(21, 24)
+            L = spgram.liftering(5, "low")
+        finally:
+            self.spectrogram._TIME_TILE = tile
+        self.assertEqual(L.get_kind(), "amp")
+        ref = self.ceps.liftering(spgram.get_amp(), 5, "low")
+        np.testing.assert_allclose(L.get_data(), ref, rtol=1e-5, atol=1e-6 * np.abs(ref).max())
+        np.testing.assert_array_equal(L.get_xdata(), spgram.get_xdata())
+        # 切り出した範囲の先頭が0列目
+        np.testing.assert_allclose(L._smp2ms(0), spgram._smp2ms(spgram._x_ss), rtol=0, atol=1e-9)
+
+    def test_liftering_many(self):
+        spec = self.sig.gwt(a_N=64).time_average()
+        lifters = [(5, "low"), (15, "low"), (13, "high")]
+        many = spec.liftering_many(lifters)
+        self.assertEqual(len(many), len(lifters))
+        for (lifter, mode), S in zip(lifters, many):
+            np.testing.assert_allclose(S.get_data(), spec.liftering(lifter, mode).get_data(), rtol=1e-10, atol=1e-12)
+            np.testing.assert_array_equal(S.get_xdata(), spec.get_xdata())
+
+    def test_gwt_batch(self):
+        """gwt_batchはSignalData毎のgwt()と同じSpectrogramData(時刻の原点を含む)を返す"""
+        other = SignalData().load_wav(AUDIO_PATH, 'M').slice_time_ms(200, 240)
+        sigs = [self.sig, other]
+        for A, sig in zip(SignalData.gwt_batch(sigs, a_N=32, roi_ms=(20, 25)), sigs):
+            self._assert_same(sig.gwt(a_N=32, roi_ms=(20, 25)), A)
+        with self.assertRaises(ValueError):
+            SignalData.gwt_batch([self.sig, other.slice_time_ms(0, 10)], a_N=8)
+
+    def test_gwt_average(self):
+        """gwt_averageはgwt().slice_time_ms().time_average()と同じスペクトル"""
+        A = self.sig.gwt(a_N=64).slice_time_ms(21, 24).time_average()
+        B = self.sig.gwt_average(21, 24, a_N=64)
+        np.testing.assert_array_equal(B.get_xdata(), A.get_xdata())
+        np.testing.assert_allclose(B.get_data(), A.get_data(), rtol=1e-4)
+        for name, value in (("roi", (0, 10)), ("roi_ms", (0, 1)), ("output", "db"), ("out", np.empty(64))):
+            with self.assertRaises(ValueError):
+                self.sig.gwt_average(21, 24, a_N=64, **{name: value})
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+#! coding:utf-8
+"""
+spectral.pyのテスト
+"""
+import unittest
+
+import numpy as np
+
+import spectral
+from spectral import dct, fft, fftfreq, get_window, irfft, next_fast_len, rfft, rfftfreq
+
+
+class TestWindow(unittest.TestCase):
+    def test_cache(self):
+        """同じ(種類, 長さ, dtype)には同じ読み取り専用の配列を返す"""
+        spectral._window.cache_clear()
+        a = get_window("hanning", 1931)
+        self.assertIs(get_window("hanning", 1931), a)
+        self.assertIsNot(get_window("hanning", 1931, np.float32), a)
+        self.assertFalse(a.flags.writeable)
+        np.testing.assert_array_equal(a, np.hanning(1931))
+        np.testing.assert_array_equal(get_window("hamming", 256), np.hamming(256))
+        np.testing.assert_array_equal(get_window("square", 16), np.ones(16))
+        self.assertEqual(spectral._window.cache_info().misses, 4)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            get_window("kaiser", 16)
+
+
+class TestFft(unittest.TestCase):
+    def test_next_fast_len(self):
+        for n in (1, 1931, 17011, 4096):
+            m = next_fast_len(n)
+            self.assertGreaterEqual(m, n)
+            self.assertLess(m, 2 * n)
+        self.assertEqual(next_fast_len(4096), 4096)
+
+    def test_matches_numpy(self):
+        """0埋め, workersの有無によらずnumpy.fftと一致する. 周波数軸は0埋め後の長さ"""
+        x = np.random.RandomState(0).randn(2, 1931)
+        n = next_fast_len(1931)
+        for workers in (1, 2, None):
+            np.testing.assert_allclose(rfft(x, n, workers=workers), np.fft.rfft(x, n), rtol=0, atol=1e-10)
+            np.testing.assert_allclose(fft(x, workers=workers), np.fft.fft(x), rtol=0, atol=1e-10)
+            np.testing.assert_allclose(irfft(rfft(x, n), n, workers=workers)[:, :1931], x, rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(fftfreq(n, 44100), np.fft.fftfreq(n, 1. / 44100))
+        np.testing.assert_array_equal(rfftfreq(n, 44100), np.fft.rfftfreq(n, 1. / 44100))
+
+    def test_dct(self):
+        """DCT-I, DCT-IIは定義式と一致する. numpy.fftのみの計算(rfft, irfft)も同じ"""
+        x = np.random.RandomState(0).randn(3, 37)
+        K = x.shape[-1]
+        n, k = np.arange(K), np.arange(K)[:, None]
+        y2 = 2 * x.dot(np.cos(np.pi * k * (2 * n + 1) / (2. * K)).T)
+        c = np.cos(np.pi * k * n / (K - 1.))
+        c[:, 1:-1] *= 2
+        y1 = x.dot(c.T)
+        backend = spectral._fft
+        try:
+            for spectral._fft in (backend, None):
+                np.testing.assert_allclose(dct(x, 2), y2, rtol=0, atol=1e-10)
+                np.testing.assert_allclose(dct(x, 1), y1, rtol=0, atol=1e-10)
+        finally:
+            spectral._fft = backend
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#! coding:utf-8
+"""
+stft.pyのテスト
+"""
+import unittest
+
+import numpy as np
+
+import stft as stftmodule
+from stft import stft, istft, frange, StftStream, IstftStream
+from _testdata import ImpactTestCase
+
+
+def _stft_loop(x, win, step, output="complex"):
+    """従来のフレーム毎のfftによる実装(比較用)"""
+    l, N = x.size, win.size
+    M = int(np.ceil(float(l - N + step) / step)) + N - 1
+    new_x = np.zeros(N + (M - 1) * step)
+    new_x[:l] = x
+    X = np.zeros([M, N], dtype=np.complex64 if output == "complex" else np.float32)
+    for m in range(M):
+        start = step * m
+        Y = np.fft.fft(new_x[start:start + N] * win)
+        X[m, :] = Y if output == "complex" else np.abs(Y)
+    if output == "db":
+        np.maximum(X, 1e-8, out=X)
+        np.log10(X, out=X)
+        X *= 20
+    return X
+
+
+def _istft_loop(X, win, step):
+    """従来のフレーム毎のifftとoverlap-addによる実装(比較用)"""
+    M, N = X.shape
+    l = (M - 1) * step + N
+    x = np.zeros(l)
+    wsum = np.zeros(l)
+    for m in range(M):
+        start = step * m
+        x[start:start + N] += np.fft.ifft(X[m, :]).real * win
+        wsum[start:start + N] += win ** 2
+    pos = (wsum != 0)
+    x[pos] /= wsum[pos]
+    return x
+
+
+class TestStft(ImpactTestCase):
+    def test_matches_loop(self):
+        """従来のループ実装と同じ値(両側N列)"""
+        for N, step in ((256, 128), (255, 64), (512, 100)):
+            win = np.hamming(N)
+            for output in ("complex", "amp", "db"):
+                A = _stft_loop(self.x, win, step, output)
+                B = stft(self.x, win, step, output)
+                self.assertEqual(B.shape, A.shape)
+                self.assertEqual(B.dtype, A.dtype)
+                np.testing.assert_allclose(B, A, rtol=0, atol=1e-6 * np.abs(A).max())
+
+    def test_onesided_out(self):
+        win = np.hamming(256)
+        A = stft(self.x, win, 128)
+        B = stft(self.x, win, 128, onesided=True)
+        self.assertEqual(B.shape, (A.shape[0], 129))
+        np.testing.assert_array_equal(B, A[:, :129])
+        # 出力先の先頭k列だけを書き込む
+        out = np.empty((A.shape[0], 128), dtype=np.float32)
+        self.assertIs(stft(self.x, win, 128, "db", onesided=True, out=out), out)
+        np.testing.assert_allclose(out, 20 * np.log10(np.maximum(np.abs(A[:, :128]), 1e-8)), rtol=0, atol=1e-4)
+        out = np.empty((A.shape[0], 200), dtype=np.complex64)
+        stft(self.x, win, 128, out=out)
+        np.testing.assert_array_equal(out, A[:, :200])
+
+    def test_short(self):
+        """窓幅より短い入力"""
+        win = np.hamming(256)
+        A = _stft_loop(self.x[:100], win, 64)
+        np.testing.assert_allclose(stft(self.x[:100], win, 64), A, rtol=0, atol=1e-6 * np.abs(A).max())
+
+    def test_frange(self):
+        np.testing.assert_allclose(frange(4, 8000.), [0, 2000, -4000, -2000])
+
+
+class TestIstft(ImpactTestCase):
+    def test_matches_loop(self):
+        """エルミートでない(加工した)スペクトログラムでも従来のループ実装と一致する"""
+        rng = np.random.RandomState(0)
+        for N, step in ((256, 128), (256, 64), (255, 100), (64, 200)):
+            win = np.hamming(N)
+            X = rng.randn(37, N) + 1j * rng.randn(37, N)
+            A = _istft_loop(X, win, step)
+            B = istft(X, win, step)
+            self.assertEqual(B.shape, A.shape)
+            np.testing.assert_allclose(B, A, rtol=0, atol=1e-12)
+
+    def test_roundtrip(self):
+        """stft -> istft で元の信号に戻る. onesided=Trueの結果も受け付ける"""
+        win = np.hamming(256)
+        for step in (128, 64, 100):
+            X = stft(self.x, win, step)
+            y = istft(X, win, step)
+            np.testing.assert_allclose(y[:self.x.size], self.x, rtol=0, atol=1e-5)
+            np.testing.assert_array_equal(istft(stft(self.x, win, step, onesided=True), win, step), y)
+
+    def test_batch(self):
+        """<clips, M, N>は1本ずつのistftと一致する. 窓の正規化はキャッシュする"""
+        win = np.hamming(128)
+        X = np.array([stft(self.x * k, win, 32) for k in (1, 2, 3)])
+        stftmodule._window_sum.cache_clear()
+        Y = istft(X, win, 32)
+        for k in range(3):
+            np.testing.assert_array_equal(Y[k], istft(X[k], win, 32))
+        info = stftmodule._window_sum.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 3))
+
+
+class TestStftStream(ImpactTestCase):
+    def _chunks(self, a, n, seed):
+        edges = np.sort(np.random.RandomState(seed).randint(0, len(a), n))
+        return np.split(a, edges)
+
+    def test_matches_batch(self):
+        """任意の長さのチャンクに分けた結果の連結はstft()と一致する. 保持するのはN - step未満"""
+        for N, step in ((256, 128), (256, 64), (255, 100), (64, 200)):
+            win = np.hamming(N)
+            for output, onesided in (("complex", False), ("db", True)):
+                A = stft(self.x, win, step, output, onesided)
+                stream = StftStream(win, step, output, onesided)
+                parts = []
+                for c in self._chunks(self.x, 40, N):
+                    parts.append(stream.process(c))
+                    self.assertLess(stream._buf.size, N)
+                parts.append(stream.flush())
+                np.testing.assert_array_equal(np.vstack(parts), A)
+
+    def test_istft_matches_batch(self):
+        """フレームを分けて入れた結果の連結はistft()と一致する"""
+        for N, step in ((256, 128), (256, 64), (255, 100), (64, 200)):
+            win = np.hamming(N)
+            X = stft(self.x, win, step)
+            stream = IstftStream(win, step)
+            parts = []
+            for c in self._chunks(X, 10, N):
+                parts.append(stream.process(c))
+                self.assertLessEqual(stream._x.size, N)
+            parts.append(stream.flush())
+            np.testing.assert_allclose(np.concatenate(parts), istft(X, win, step), rtol=0, atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()